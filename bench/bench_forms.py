@@ -0,0 +1,82 @@
+# Micro-benchmark: brs.forms (lxml) vs the BeautifulSoup parsing it replaced.
+#   python bench/bench_forms.py [iterations]
+import sys, os, time
+from pathlib import Path
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from brs.forms import extract_login_form, has_password_input, extract_booking_form, find_autocomplete_url
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# --- the previous BeautifulSoup implementations, kept here as the baseline ---
+def bs_login_form(text):
+    soup = BeautifulSoup(text, "lxml")
+    form_el = soup.find("form", attrs={"name": True}) or soup.find("form")
+    data = {}
+    for inp in form_el.find_all("input"):
+        nm = inp.get("name"); t = (inp.get("type") or "").lower()
+        if not nm: continue
+        if t in ("checkbox","radio"):
+            if inp.has_attr("checked"): data[nm] = inp.get("value","on")
+        else:
+            data[nm] = inp.get("value","")
+    return form_el.get("action"), data
+
+def bs_has_password(text):
+    return bool(BeautifulSoup(text, "lxml").find("input", {"type":"password"}))
+
+def bs_booking_form(text):
+    soup = BeautifulSoup(text, "lxml")
+    form = None
+    for f in soup.find_all("form"):
+        names = " ".join([inp.get("name","") for inp in f.find_all("input")])
+        if "player_1" in names:
+            form = f; break
+    fields = {}
+    for inp in form.find_all(["input","select","textarea"]):
+        nm = inp.get("name"); t = (inp.get("type") or "").lower()
+        if not nm: continue
+        if inp.name == "select":
+            sel = inp.find("option", selected=True) or inp.find("option")
+            fields[nm] = sel.get("value","") if sel else fields.get(nm,"")
+        elif t in ("checkbox","radio"):
+            if inp.has_attr("checked"): fields[nm] = inp.get("value","on")
+            elif nm not in fields: fields[nm] = ""
+        else:
+            fields[nm] = inp.get("value","")
+    return form.get("action"), fields
+
+def bs_autocomplete(text):
+    soup = BeautifulSoup(text, "lxml")
+    txt = soup.find("input", attrs={"name": "member_booking_form[player_1_text]"}) or \
+          soup.find("input", attrs={"data-autocomplete-url": True})
+    return txt.get("data-autocomplete-url") if txt else None
+
+def lean_login_form(text):
+    f = extract_login_form(text)
+    return f["action"], f["fields"]
+
+CASES = [
+    ("login form", "login.html", bs_login_form, lean_login_form),
+    ("login failure check", "login.html", bs_has_password, has_password_input),
+    ("booking form", "booking.html", bs_booking_form, extract_booking_form),
+    ("autocomplete url", "booking.html", bs_autocomplete, find_autocomplete_url),
+]
+
+def timeit(fn, text, n):
+    t = time.perf_counter()
+    for _ in range(n): fn(text)
+    return (time.perf_counter() - t) / n * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'case':<22}{'bs4 µs':>10}{'lxml µs':>10}{'speedup':>9}")
+    for name, fixture, old, new in CASES:
+        text = (FIXTURES / fixture).read_text()
+        assert old(text) == new(text), f"{name}: outputs differ"
+        a, b = timeit(old, text, n), timeit(new, text, n)
+        print(f"{name:<22}{a:>10.0f}{b:>10.0f}{a / b:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
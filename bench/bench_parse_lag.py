@@ -0,0 +1,36 @@
+# Event-loop lag while booking pages are parsed, inline vs in the parse pool.
+#   python bench/bench_parse_lag.py [concurrent_parses] [pool_workers]
+import sys, os, asyncio, time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from brs import parsing
+from brs.forms import extract_booking_form
+from brs.utils import LoopLagMonitor
+
+PAGE = (Path(__file__).resolve().parent / "fixtures" / "booking.html").read_text()
+
+async def burst(n: int) -> dict:
+    lag = LoopLagMonitor(interval=0.005, window=100000).start()
+    await asyncio.sleep(0.05)
+    t = time.perf_counter()
+    # many jobs hitting a freed slot at once: each parses its booking page
+    for _ in range(5):
+        await asyncio.gather(*(parsing.parse(extract_booking_form, PAGE) for _ in range(n)))
+        await asyncio.sleep(0.01)
+    wall = time.perf_counter() - t
+    lag.stop()
+    return {"wall_ms": round(wall * 1000), **lag.snapshot()}
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, (os.cpu_count() or 2))
+    parsing.configure(0)
+    print("inline      ", asyncio.run(burst(n)))
+    parsing.configure(workers)
+    asyncio.run(burst(2))  # warm the pool
+    print(f"pool ({workers}) ", asyncio.run(burst(n)))
+    parsing.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# End-to-end load test: N jobs through the real worker scheduler against the
+# local stand-in server (bench/fakebrs.py), which frees in-window tee times at
+# random. Reports upstream requests/sec, slot-freed → first poll / → booked
+# latency, cancel→book gap, loop lag, job outcomes and memory per job.
+#   python bench/bench_worker.py [--jobs 50] [--seconds 60] [--latency 0.05] [--churn 0.2] [--poll 5]
+import sys, os, io, json, time, asyncio, argparse, socket, tempfile, contextlib, multiprocessing
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import fakebrs
+
+CLUB, COURSE = "benchclub", "1"
+MEMBER_SLOTS = [t for t in fakebrs.slot_times() if t >= "12:00"]  # members start booked in the afternoon
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(p * len(xs)))], 1) if xs else None
+
+def layout(n: int) -> list[tuple[str, str, str]]:
+    # (yyyy/mm/dd, HH:MM, member) per job; as many jobs per date as there are afternoon slots
+    out = []
+    for i in range(n):
+        day = date.today() + timedelta(days=3 + i // len(MEMBER_SLOTS))
+        out.append((day.strftime("%Y/%m/%d"), MEMBER_SLOTS[i % len(MEMBER_SLOTS)], f"m{i}"))
+    return out
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--jobs", type=int, default=50)
+    p.add_argument("--seconds", type=float, default=60)
+    p.add_argument("--latency", type=float, default=0.05)
+    p.add_argument("--churn", type=float, default=0.2, help="slots freed per second per sheet")
+    p.add_argument("--hold", type=float, default=5.0)
+    p.add_argument("--poll", type=int, default=5)
+    p.add_argument("--window", default="08:00-10:00")
+    a = p.parse_args()
+
+    jobs = layout(a.jobs)
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=fakebrs.serve, daemon=True, kwargs=dict(
+        port=port, ready=ready, bookings=[(CLUB, COURSE, d.replace("/", ""), t, m) for d, t, m in jobs],
+        latency=a.latency, churn=a.churn, window=tuple(a.window.split("-")), hold=a.hold, seed=1))
+    server.start()
+    ready.wait(10)
+
+    # configure the worker before brs is imported (config is read at import time)
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{db_path}", BRS_BASE=f"http://127.0.0.1:{port}", VERBOSE="false",
+        LOOP_LAG_REPORT_SECONDS="0", CHANGE_POLL_SECONDS="1", RESCAN_SECONDS="5", MIN_POLL_SECONDS="1",
+        WORKER_MAX_JOBS=str(a.jobs), CLAIM_BATCH=str(a.jobs), CLUB_RPS="1000", CLUB_BURST="1000",
+        PERSIST_SESSIONS="false",
+    )
+    from brs.models import init_db, SessionLocal, User, Job, JobEvent
+    from brs.security import encrypt
+    import worker.worker as w
+
+    init_db()
+    db = SessionLocal()
+    u = User(email="bench@example.com", password_hash="x")
+    db.add(u); db.commit()
+    lo, hi = a.window.split("-")
+    for d, t, m in jobs:
+        db.add(Job(user_id=u.id, club_slug=CLUB, course_id=COURSE, member_username_enc=encrypt(m),
+                   member_password_enc=encrypt(fakebrs.PASSWORD), target_date=d, earliest=lo, latest=hi,
+                   current_time=t, required_seats=4, accept_at_least=True, player_ids_csv="1,2,3,4",
+                   poll_seconds=a.poll, max_minutes=max(1, int(a.seconds // 60) + 1), status="active"))
+    db.commit()
+
+    rss0 = rss_mb()
+    peak = [rss0]
+    async def run():
+        sched = asyncio.create_task(w.scheduler_loop())
+        t_end = time.monotonic() + a.seconds
+        while time.monotonic() < t_end and not sched.done():
+            await asyncio.sleep(1)
+            peak[0] = max(peak[0], rss_mb())
+        lag = w.LAG.snapshot()
+        sched.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sched
+        await w.SESSIONS.close()
+        return lag
+
+    print(f"[bench] {a.jobs} jobs, {a.seconds:.0f}s, latency {a.latency*1000:.0f}ms, churn {a.churn}/s/sheet, poll {a.poll}s", flush=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lag = asyncio.run(run())
+
+    import httpx
+    stats = httpx.get(f"http://127.0.0.1:{port}/_stats").json()
+    server.terminate()
+
+    db = SessionLocal()
+    outcomes = {}
+    for (status,) in db.query(Job.status):
+        outcomes[status] = outcomes.get(status, 0) + 1
+    gaps = [e.latency_ms for e in db.query(JobEvent).filter(JobEvent.phase == "swap") if e.latency_ms is not None]
+    db.close()
+
+    print(json.dumps({
+        "upstream": stats,
+        "client_cancel_to_book_ms": {"n": len(gaps), "p50": pct(gaps, .5), "p99": pct(gaps, .99)},
+        "loop_lag": lag,
+        "jobs": outcomes,
+        "rss_mb": {"before": round(rss0, 1), "peak": round(peak[0], 1), "per_job_kb": round((peak[0] - rss0) * 1024 / max(1, a.jobs), 1)},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# Local stand-in for members.brsgolf.com: login, tee-sheet JSON, tokenised book
+# URLs, booking form/store, delete and member autocomplete, with configurable
+# latency and cancellation churn. Plain asyncio HTTP/1.1, no dependencies.
+#   python bench/fakebrs.py [--port 8765] [--latency 0.05] [--churn 0.5] [--window 08:00-10:00]
+# Members log in as any username with password "pw". GET /_stats returns counters.
+import argparse, asyncio, json, random, re, secrets, time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+LOGIN_HTML = (FIXTURES / "login.html").read_text()
+BOOK_HTML = (FIXTURES / "booking.html").read_text()
+PASSWORD = "pw"
+OTHER = "other"
+
+
+def slot_times(first="06:00", last="19:00", step=7) -> list[str]:
+    h, m = map(int, first.split(":"))
+    lh, lm = map(int, last.split(":"))
+    out, t = [], h * 60 + m
+    while t <= lh * 60 + lm:
+        out.append(f"{t // 60:02d}:{t % 60:02d}"); t += step
+    return out
+
+
+class Slot:
+    __slots__ = ("owner", "players", "freed_at", "polled_at", "token")
+
+    def __init__(self, owner=None, players=()):
+        self.owner, self.players = owner, list(players)
+        self.freed_at = self.polled_at = None
+        self.token = secrets.token_hex(4)
+
+
+class FakeBRS:
+    def __init__(self, latency=0.05, churn=0.0, window=("08:00", "10:00"), hold=5.0, seed=None):
+        self.latency = latency    # mean per-request delay, seconds (uniform ±50%)
+        self.churn = churn        # in-window slots freed per second per sheet
+        self.window = window      # where churn frees slots
+        self.hold = hold          # seconds a freed slot stays free before someone else books it
+        self.rng = random.Random(seed)
+        self.sheets: dict[tuple, dict[str, Slot]] = {}  # (club, course, ymd) -> HH:MM -> Slot
+        self.started = time.monotonic()
+        self.requests: dict[str, int] = {}
+        self.free_to_poll: list[float] = []   # slot freed -> first sheet fetch after it
+        self.free_to_book: list[float] = []   # slot freed -> a member booked it
+        self.cancel_to_book: list[float] = [] # a member's cancel -> the same member's next booking
+        self.races_lost = 0
+        self._cancelled_at: dict[str, float] = {}
+
+    # --- state ---
+    def sheet(self, club, course, ymd) -> dict[str, Slot]:
+        key = (club, course, ymd)
+        if key not in self.sheets:
+            self.sheets[key] = {t: Slot(OTHER, ["Other"] * 4) for t in slot_times()}
+        return self.sheets[key]
+
+    def seed_booking(self, club, course, ymd, hhmm, member):
+        self.sheet(club, course, ymd)[hhmm] = Slot(member, [member] * 4)
+
+    async def churn_loop(self):
+        lo, hi = self.window
+        while self.churn > 0:
+            await asyncio.sleep(self.rng.expovariate(self.churn))
+            now = time.monotonic()
+            for sheet in list(self.sheets.values()):
+                # someone cancels an in-window tee time...
+                full = [t for t, s in sheet.items() if lo <= t <= hi and s.owner == OTHER]
+                if full:
+                    t = self.rng.choice(full)
+                    s = sheet[t] = Slot()
+                    s.freed_at = now
+                # ...and slots nobody grabbed in time get booked by someone else
+                for t, s in sheet.items():
+                    if s.owner is None and s.freed_at and now - s.freed_at > self.hold:
+                        sheet[t] = Slot(OTHER, ["Other"] * 4)
+
+    # --- HTTP ---
+    def count(self, kind):
+        self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    async def handle(self, method, path, query, body, cookies) -> tuple[int, dict, bytes]:
+        if path == "/_stats":
+            return 200, {"content-type": "application/json"}, json.dumps(self.stats()).encode()
+        m = re.match(r"^/([\w-]+)/(.*)$", path)
+        if not m: return 404, {}, b""
+        club, rest = m.groups()
+        if self.latency:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        member = cookies.get("sid")
+
+        if rest == "login":
+            self.count("login")
+            if method == "POST":
+                form = parse_qs(body.decode())
+                user = (form.get("login_form[username]") or [""])[0]
+                if user and (form.get("login_form[password]") or [""])[0] == PASSWORD:
+                    return 200, {"set-cookie": f"sid={user}; Path=/"}, b"<html><body>Welcome</body></html>"
+            return 200, {}, self.login_page(club)
+        if not member:
+            return 200, {}, self.login_page(club)  # logged out: BRS serves the login form
+
+        if m := re.match(r"^tee-sheet/data/(\w+)/(\d{4}/\d{2}/\d{2})$", rest):
+            self.count("sheet")
+            course, ymd = m.group(1), m.group(2).replace("/", "")
+            return 200, {"content-type": "application/json"}, json.dumps(self.sheet_json(club, course, ymd)).encode()
+        if m := re.match(r"^bookings/book/(\w+)/(\d{8})/(\d{4})$", rest):
+            self.count("book_form")
+            course, ymd, hhmm = m.groups()
+            s = self.sheet(club, course, ymd).get(f"{hhmm[:2]}:{hhmm[2:]}")
+            if not s or query.get("tok", [""])[0] != s.token: return 403, {}, b"bad token"
+            return 200, {}, self.booking_page(club, course, ymd, hhmm)
+        if (m := re.match(r"^bookings/store/(\w+)/(\d{8})/(\d{4})$", rest)) and method == "POST":
+            self.count("store")
+            return self.store(club, *m.groups(), member, parse_qs(body.decode()))
+        if (m := re.match(r"^bookings/delete/(\w+)/(\d{8})/(\d{4})$", rest)) and method == "POST":
+            self.count("delete")
+            course, ymd, hhmm = m.groups()
+            sheet = self.sheet(club, course, ymd)
+            t = f"{hhmm[:2]}:{hhmm[2:]}"
+            if sheet.get(t) is None or sheet[t].owner != member: return 404, {}, b"no booking"
+            sheet[t] = Slot()  # no freed_at: the churn metrics only track slots other golfers give up
+            self._cancelled_at[member] = time.monotonic()
+            return 200, {}, b"<html>cancelled</html>"
+        if rest.endswith("members/autocomplete"):
+            self.count("autocomplete")
+            q = (query.get("term") or query.get("q") or [""])[0].lower()
+            names = [f"Member{i}, Test" for i in range(1, 200)]
+            return 200, {"content-type": "application/json"}, json.dumps(
+                [{"id": i + 1, "text": n} for i, n in enumerate(names) if q in n.lower()][:10]).encode()
+        self.count("other")
+        return 404, {}, b""
+
+    def store(self, club, course, ymd, hhmm, member, form):
+        t = f"{hhmm[:2]}:{hhmm[2:]}"
+        s = self.sheet(club, course, ymd).get(t)
+        players = [v[0] for k, v in form.items() if re.match(r"member_booking_form\[player_\d\]$", k) and v[0]]
+        if s is None: return 404, {}, b""
+        if 4 - len(s.players) < len(players):
+            self.races_lost += 1
+            return 409, {}, b"<html>Sorry, this tee time is no longer available</html>"
+        now = time.monotonic()
+        if s.freed_at: self.free_to_book.append(now - s.freed_at)
+        if member in self._cancelled_at: self.cancel_to_book.append(now - self._cancelled_at.pop(member))
+        s.owner, s.players, s.freed_at = member, s.players + [member] * len(players), None
+        return 200, {}, b"<html>Booking confirmed</html>"
+
+    def sheet_json(self, club, course, ymd) -> dict:
+        now = time.monotonic()
+        times = {}
+        for t, s in self.sheet(club, course, ymd).items():
+            if s.freed_at and s.polled_at is None:
+                s.polled_at = now
+                self.free_to_poll.append(now - s.freed_at)
+            tee = {"slots": 4, "players": [{"name": p} for p in s.players], "bookable": len(s.players) < 4}
+            if tee["bookable"]:
+                tee["url"] = f"\\/{club}\\/bookings\\/book\\/{course}\\/{ymd}\\/{t.replace(':', '')}?tok={s.token}"
+            times[t] = {"tee_time": tee}
+        return {"times": times}
+
+    def login_page(self, club) -> bytes:
+        return LOGIN_HTML.replace("/moyola/", f"/{club}/").replace(
+            "0b1c2a7d5e8f9a3b4c6d7e8f9a0b1c2d3e4f5a6b", secrets.token_hex(20)).encode()
+
+    def booking_page(self, club, course, ymd, hhmm) -> bytes:
+        return BOOK_HTML.replace("/moyola/bookings/store/1/20250905/0810", f"/{club}/bookings/store/{course}/{ymd}/{hhmm}") \
+            .replace("/moyola/", f"/{club}/").replace("9f8e7d6c5b4a39281706f5e4d3c2b1a0", secrets.token_hex(16)).encode()
+
+    def stats(self) -> dict:
+        def pct(xs, p):
+            xs = sorted(xs)
+            return round(xs[min(len(xs) - 1, int(p * len(xs)))] * 1000, 1) if xs else None
+        elapsed = time.monotonic() - self.started
+        total = sum(self.requests.values())
+        return {
+            "elapsed_s": round(elapsed, 1), "requests": self.requests, "rps": round(total / elapsed, 1) if elapsed else 0,
+            "free_to_poll_ms": {"n": len(self.free_to_poll), "p50": pct(self.free_to_poll, .5), "p99": pct(self.free_to_poll, .99)},
+            "free_to_book_ms": {"n": len(self.free_to_book), "p50": pct(self.free_to_book, .5), "p99": pct(self.free_to_book, .99)},
+            "cancel_to_book_ms": {"n": len(self.cancel_to_book), "p50": pct(self.cancel_to_book, .5), "p99": pct(self.cancel_to_book, .99)},
+            "races_lost": self.races_lost,
+        }
+
+    async def serve_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                cookies = dict(c.strip().split("=", 1) for c in headers.get("cookie", "").split(";") if "=" in c)
+                u = urlsplit(target)
+                status, extra, payload = await self.handle(method, u.path, parse_qs(u.query), body, cookies)
+                hdrs = {"content-type": "text/html; charset=utf-8", **extra, "content-length": str(len(payload))}
+                writer.write(f"HTTP/1.1 {status} X\r\n".encode() + "".join(f"{k}: {v}\r\n" for k, v in hdrs.items()).encode() + b"\r\n" + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765) -> asyncio.base_events.Server:
+        server = await asyncio.start_server(self.serve_conn, host, port, backlog=1024)
+        asyncio.create_task(self.churn_loop())
+        return server
+
+
+async def _serve(host, port, fake: FakeBRS, ready=None):
+    server = await fake.start(host, port)
+    print(f"[fakebrs] listening on http://{host}:{port}", flush=True)
+    if ready is not None: ready.set()
+    async with server:
+        await server.serve_forever()
+
+def serve(host="127.0.0.1", port=8765, bookings=(), ready=None, **kw):
+    # blocking; bookings: (club, course, yyyymmdd, HH:MM, member) tuples. Used by bench_worker.py
+    fake = FakeBRS(**kw)
+    for b in bookings:
+        fake.seed_booking(*b)
+    try:
+        asyncio.run(_serve(host, port, fake, ready))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.05)
+    p.add_argument("--churn", type=float, default=0.0)
+    p.add_argument("--window", default="08:00-10:00")
+    p.add_argument("--hold", type=float, default=5.0)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--book", action="append", help="seed a member booking: club/course/yyyymmdd/HH:MM/member")
+    a = p.parse_args()
+    serve(a.host, a.port, [tuple(b.split("/")) for b in a.book or []],
+          latency=a.latency, churn=a.churn, window=tuple(a.window.split("-")), hold=a.hold, seed=a.seed)
@@ -0,0 +1,62 @@
+import asyncio, contextvars, os, threading
+
+# One long-lived event loop in a background thread for a threaded (sync) web
+# server. Request threads hand their coroutines to it, so all upstream I/O is
+# multiplexed on one loop: HTTP pools, pooled BRS sessions and caches are
+# shared by every request instead of being rebuilt per request loop.
+
+class LoopBusy(RuntimeError):
+    pass
+
+
+class LoopThread:
+    def __init__(self, limit=32, queue_seconds=10.0, name="brs-aio"):
+        # limit: coroutines running at once; more wait up to queue_seconds, then LoopBusy
+        self.limit = limit
+        self.queue_seconds = queue_seconds
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._pid = None
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():  # fresh loop after a fork
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop, self._pid = loop, os.getpid()
+                self._sem = asyncio.run_coroutine_threadsafe(self._make_sem(), loop).result()
+            return self._loop
+
+    async def _make_sem(self):
+        return asyncio.Semaphore(self.limit)
+
+    def run(self, coro, timeout: float | None = None):
+        # run coro on the loop with the caller's contextvars (Flask's request context) and wait for it
+        loop = self.loop()
+        fut = asyncio.run_coroutine_threadsafe(self._limited(contextvars.copy_context(), coro), loop)
+        try:
+            return fut.result(timeout)
+        except TimeoutError:
+            fut.cancel()
+            raise
+
+    async def _limited(self, ctx, coro):
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.queue_seconds)
+        except asyncio.TimeoutError:
+            coro.close()
+            raise LoopBusy(f"{self.limit} requests already in flight")
+        self.in_flight += 1
+        try:
+            task = ctx.run(asyncio.ensure_future, coro)
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
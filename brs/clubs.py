@@ -0,0 +1,197 @@
+import asyncio, bisect, json, re, threading, time, httpx
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import select
+from .config import BRS_BASE, SLUG_HIT_TTL, SLUG_MISS_TTL, SLUG_PROBE_TIMEOUT, SLUG_PROBE_BUDGET
+from .engine import DEFAULT_UA
+from .models import SessionLocal, Club
+from .transport import new_client
+
+# In-memory club catalog for autocomplete: seeded from data/clubs_uk.json and
+# the clubs table, indexed by word prefix and by character trigram so a query
+# is answered without touching the database.
+
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "clubs_uk.json"
+
+def norm(s: str) -> str:
+    s = s.lower().strip()
+    s = re.sub(r"(golf( club)?|g.c.|g&cc|g\s*&\s*c|\bgc\b)$", "", s)
+    s = re.sub(r"[^a-z0-9\s-]", "", s)
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+def trigrams(s: str) -> set[str]:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class ClubCatalog:
+    def __init__(self, refresh_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self._names: dict[str, str] = {}          # slug -> display name
+        self._keys: dict[str, str] = {}           # slug -> normalised "name slug words"
+        self._grams: dict[str, set[str]] = {}     # trigram -> slugs
+        self._words: list[tuple[str, str]] = []   # sorted (word, slug) for prefix lookups
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._db_since: datetime | None = None
+        self._refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, slug: str):
+        return slug in self._names
+
+    def add(self, name: str, slug: str):
+        with self._lock:
+            self._add(name, slug)
+
+    def _add(self, name: str, slug: str):
+        if slug in self._names:
+            if self._names[slug] == name or name == slug: return
+            self._remove(slug)
+        key = f"{norm(name)} {slug.replace('-', ' ').replace('_', ' ')}"
+        self._names[slug], self._keys[slug] = name, key
+        for g in trigrams(key):
+            self._grams.setdefault(g, set()).add(slug)
+        for w in set(key.split()):
+            bisect.insort(self._words, (w, slug))
+
+    def _remove(self, slug: str):
+        key = self._keys.pop(slug)
+        self._names.pop(slug)
+        for g in trigrams(key):
+            self._grams.get(g, set()).discard(slug)
+        self._words = [ws for ws in self._words if ws[1] != slug]
+
+    def load_json(self, path=CATALOG_PATH):
+        try:
+            rows = json.loads(Path(path).read_text())
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for r in rows:
+                if r.get("slug"): self._add(r.get("name") or r["slug"], r["slug"])
+
+    def refresh(self, force=False):
+        # pull clubs added/changed in the DB since the last refresh (throttled)
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_seconds: return
+        self._refreshed_at = now
+        db = SessionLocal()
+        try:
+            q = select(Club.name, Club.slug, Club.updated_at)
+            if self._db_since: q = q.where(Club.updated_at > self._db_since)
+            rows = db.execute(q).all()
+        finally:
+            db.close()
+        with self._lock:
+            for name, slug, ts in rows:
+                self._add(name or slug, slug)
+                if ts and (not self._db_since or ts > self._db_since): self._db_since = ts
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load_json()
+            self._loaded = True
+            self.refresh(force=True)
+        else:
+            self.refresh()
+
+    def search(self, q: str, limit=20) -> list[dict]:
+        nq = norm(q)
+        if not nq: return []
+        words = nq.split()
+        scores: Counter = Counter()
+        # word-prefix hits: every query word must prefix some word of the club
+        prefix_sets = [self._prefix(w) for w in words]
+        for slug in set.intersection(*prefix_sets) if prefix_sets else ():
+            scores[slug] += 2.0
+        # fuzzy: trigram overlap (Jaccard) against the normalised key
+        qg = trigrams(nq)
+        hits: Counter = Counter()
+        for g in qg:
+            for slug in self._grams.get(g, ()):
+                hits[slug] += 1
+        for slug, n in hits.items():
+            sim = n / (len(qg) + len(trigrams(self._keys[slug])) - n)
+            if sim >= 0.2 or slug in scores:
+                scores[slug] += sim
+        for slug in scores:
+            key = self._keys[slug]
+            if key == nq or slug == nq: scores[slug] += 5.0
+            elif key.startswith(nq): scores[slug] += 1.0
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self._names[kv[0]]))
+        return [{"name": self._names[s], "slug": s} for s, _ in ranked[:limit]]
+
+    def _prefix(self, w: str) -> set[str]:
+        i = bisect.bisect_left(self._words, (w, ""))
+        out = set()
+        while i < len(self._words) and self._words[i][0].startswith(w):
+            out.add(self._words[i][1]); i += 1
+        return out
+
+
+class SlugProber:
+    # Concurrent "does /{slug}/login exist" probing with a TTL cache of hits and
+    # misses. Transport errors and probes cut off by the budget are not cached.
+    def __init__(self, catalog: ClubCatalog, base=BRS_BASE, hit_ttl=SLUG_HIT_TTL, miss_ttl=SLUG_MISS_TTL,
+                 timeout=SLUG_PROBE_TIMEOUT, budget=SLUG_PROBE_BUDGET, max_seen=10000):
+        self.catalog = catalog
+        self.base = base
+        self.hit_ttl, self.miss_ttl = hit_ttl, miss_ttl
+        self.budget = budget
+        self._seen: dict[str, tuple[bool, float]] = {}  # slug -> (exists, expires at); keyed by user input, so capped
+        self.max_seen = max_seen
+        # AsyncClient keeps no loop state of its own; SHARED hands out a pool per loop
+        self._client = new_client(timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+                                  headers={"User-Agent": DEFAULT_UA})
+
+    def cached(self, slug: str) -> bool | None:
+        hit = self._seen.get(slug)
+        if hit and hit[1] > time.monotonic(): return hit[0]
+        return None
+
+    async def probe(self, slug: str) -> bool | None:
+        try:
+            r = await self._client.get(f"{self.base}/{slug}/login")
+        except httpx.HTTPError:
+            return None
+        ok = r.status_code in (200, 302)
+        self._seen.pop(slug, None)  # re-insert at the end: dict order is then oldest first
+        self._seen[slug] = (ok, time.monotonic() + (self.hit_ttl if ok else self.miss_ttl))
+        if len(self._seen) > self.max_seen: self._prune()
+        return ok
+
+    def _prune(self):
+        # drop expired entries, then the oldest until back under the cap
+        now = time.monotonic()
+        self._seen = {s: v for s, v in self._seen.items() if v[1] > now}
+        for s in list(self._seen)[:max(0, len(self._seen) - self.max_seen)]:
+            del self._seen[s]
+
+    async def discover(self, name: str, slugs) -> list[dict]:
+        # probe the slugs that are neither catalogued nor cached, all at once, for at most `budget` seconds
+        todo = [s for s in dict.fromkeys(slugs) if s not in self.catalog and self.cached(s) is None]
+        found = [s for s in dict.fromkeys(slugs) if s not in self.catalog and self.cached(s)]
+        if todo:
+            tasks = {asyncio.create_task(self.probe(s)): s for s in todo}
+            done, pending = await asyncio.wait(tasks, timeout=self.budget)
+            for t in pending: t.cancel()
+            found += [tasks[t] for t in done if not t.cancelled() and t.exception() is None and t.result()]
+        for slug in found:
+            self._persist(name, slug)
+        return [{"name": name, "slug": s} for s in found]
+
+    def _persist(self, name: str, slug: str):
+        db = SessionLocal()
+        try:
+            if not db.scalar(select(Club.id).where(Club.slug == slug)):
+                db.add(Club(name=name, slug=slug, country="UK")); db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+        self.catalog.add(name, slug)
@@ -1,4 +1,4 @@
-import os
+import os, socket
 
 def env(key, default=None):
     v = os.environ.get(key)
@@ -7,11 +7,92 @@ def env(key, default=None):
 DATABASE_URL = env("DATABASE_URL", "sqlite:///local.db")
 SECRET_KEY = env("SECRET_KEY", "dev-secret")
 ENCRYPTION_KEY = env("ENCRYPTION_KEY")
+BRS_BASE = env("BRS_BASE", "https://members.brsgolf.com")
 
 # Worker defaults
 POLL_SECONDS = int(env("POLL_SECONDS", "20"))
 MAX_MINUTES = int(env("MAX_MINUTES", "120"))
 ACCEPT_AT_LEAST = env("ACCEPT_AT_LEAST", "true").lower() in ("1","true","yes","y")
 VERBOSE = env("VERBOSE", "true").lower() in ("1","true","yes","y")
-SCAN_DEBUG = env("SCAN_DEBUG", "true").lower() in ("1","true","yes","y")
+SCAN_DEBUG = env("SCAN_DEBUG", "false").lower() in ("1","true","yes","y")
 LIMIT_DEBUG_ROWS = int(env("LIMIT_DEBUG_ROWS", "25"))
+PARSE_WORKERS = int(env("PARSE_WORKERS", "0"))  # >0: parse HTML in a process pool of this size
+LOOP_LAG_REPORT_SECONDS = int(env("LOOP_LAG_REPORT_SECONDS", "300"))  # 0 disables the periodic report
+PREARM_SWAP = env("PREARM_SWAP", "true").lower() in ("1","true","yes","y")  # build booking payloads before cancelling
+MAX_JOB_TARGETS = int(env("MAX_JOB_TARGETS", "6"))  # (course, date) sheets one job may watch
+SHEET_GROUP_SETTLE = float(env("SHEET_GROUP_SETTLE", "0.3"))  # wait for a job's other sheets from the same poll round
+CANDIDATE_ORDER = env("CANDIDATE_ORDER", "earliest")  # default slot preference: earliest, closest (to the job's time), fewest (other players)
+CANDIDATES_PER_ROUND = int(env("CANDIDATES_PER_ROUND", "3"))  # swap attempts on one sheet snapshot before waiting for the next poll
+
+# Per-club polling budget and adaptive poll interval
+CLUB_RPS = float(env("CLUB_RPS", "2"))      # sustained sheet fetches per second per club
+CLUB_BURST = float(env("CLUB_BURST", "5"))
+MIN_POLL_SECONDS = float(env("MIN_POLL_SECONDS", "5"))
+POLL_FACTOR_NEAR = float(env("POLL_FACTOR_NEAR", "0.5"))  # within 48h of the tee date
+POLL_FACTOR_FAR = float(env("POLL_FACTOR_FAR", "3"))      # more than a week out
+POLL_JITTER = float(env("POLL_JITTER", "0.15"))
+
+# Per-club backoff and circuit breaker on 429/5xx/timeouts
+BACKOFF_BASE_SECONDS = float(env("BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(env("BACKOFF_MAX_SECONDS", "300"))
+BREAKER_THRESHOLD = int(env("BREAKER_THRESHOLD", "5"))  # consecutive failures before pausing the club
+BREAKER_COOLDOWN_SECONDS = float(env("BREAKER_COOLDOWN_SECONDS", "120"))
+
+# Worker leases (several worker processes can share the jobs table)
+WORKER_ID = env("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+LEASE_SECONDS = int(env("LEASE_SECONDS", "90"))
+HEARTBEAT_SECONDS = int(env("HEARTBEAT_SECONDS", "30"))
+WORKER_MAX_JOBS = int(env("WORKER_MAX_JOBS", "2000"))
+CLAIM_BATCH = int(env("CLAIM_BATCH", "50"))  # jobs claimed per scan, so peers get a share
+RESCAN_SECONDS = int(env("RESCAN_SECONDS", "60"))  # full claim scan (orphaned leases); changes arrive via notify
+CHANGE_POLL_SECONDS = float(env("CHANGE_POLL_SECONDS", "3"))  # updated_at polling when LISTEN/NOTIFY is unavailable
+
+# Shared HTTP transport (one pool per process)
+HTTP2 = env("HTTP2", "true").lower() in ("1","true","yes","y")
+HTTP_MAX_CONNECTIONS = int(env("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(env("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_SECONDS = float(env("HTTP_KEEPALIVE_SECONDS", "120"))
+HTTP_PER_HOST = int(env("HTTP_PER_HOST", "100"))  # in-flight requests per host
+
+# Prometheus-style metrics (see brs.metrics)
+WORKER_METRICS_PORT = int(env("WORKER_METRICS_PORT", "0"))  # 0: no metrics endpoint in the worker
+METRICS_TOKEN = env("METRICS_TOKEN")  # web /metrics is served only when set, and requires it as a bearer token
+
+# Batched job status writes from the worker (see brs.status)
+STATUS_FLUSH_SECONDS = float(env("STATUS_FLUSH_SECONDS", "0.5"))
+STATUS_RETRY_MAX_SECONDS = float(env("STATUS_RETRY_MAX_SECONDS", "30"))  # backoff cap while the DB refuses a batch
+TRACES_PER_JOB = int(env("TRACES_PER_JOB", "20"))  # swap attempt traces kept on each job
+
+# Job event log (see brs.events)
+EVENT_FLUSH_SECONDS = float(env("EVENT_FLUSH_SECONDS", "2"))
+EVENT_BATCH = int(env("EVENT_BATCH", "200"))
+EVENT_QUEUE_MAX = int(env("EVENT_QUEUE_MAX", "5000"))       # pending events beyond this are dropped
+EVENT_RETENTION_DAYS = int(env("EVENT_RETENTION_DAYS", "14"))
+EVENT_KEEP_PER_JOB = int(env("EVENT_KEEP_PER_JOB", "500"))
+EVENT_COMPACT_SECONDS = int(env("EVENT_COMPACT_SECONDS", "3600"))
+
+# Web: async views run on one shared background loop (see brs.aio)
+WEB_ASYNC_LIMIT = int(env("WEB_ASYNC_LIMIT", "32"))          # upstream-bound requests in flight
+WEB_QUEUE_SECONDS = float(env("WEB_QUEUE_SECONDS", "10"))    # wait for a slot before answering 503
+WEB_REQUEST_TIMEOUT = float(env("WEB_REQUEST_TIMEOUT", "45"))
+
+# Web: dashboard job list and live status
+JOBS_PAGE_SIZE = int(env("JOBS_PAGE_SIZE", "20"))
+JOBS_POLL_SECONDS = float(env("JOBS_POLL_SECONDS", "10"))  # dashboard polls /api/jobs for changes (paused in hidden tabs)
+
+# Web: club autocomplete catalog
+CATALOG_REFRESH_SECONDS = int(env("CATALOG_REFRESH_SECONDS", "60"))
+SLUG_HIT_TTL = int(env("SLUG_HIT_TTL", "86400"))
+SLUG_MISS_TTL = int(env("SLUG_MISS_TTL", "3600"))
+SLUG_PROBE_TIMEOUT = float(env("SLUG_PROBE_TIMEOUT", "4"))
+SLUG_PROBE_BUDGET = float(env("SLUG_PROBE_BUDGET", "5"))    # total wall time for one search's probes
+
+# Web: player search caches
+MEMBER_CACHE_TTL = int(env("MEMBER_CACHE_TTL", str(6 * 3600)))
+AUTOCOMPLETE_URL_TTL = int(env("AUTOCOMPLETE_URL_TTL", str(24 * 3600)))
+AUTOCOMPLETE_CAP = int(env("AUTOCOMPLETE_CAP", "10"))     # upstream answers this long are treated as truncated
+
+# Logged-in BRS session pool
+SESSION_IDLE_SECONDS = int(env("SESSION_IDLE_SECONDS", "1800"))
+SESSION_LOCK_SECONDS = float(env("SESSION_LOCK_SECONDS", "90"))  # wait for another request's login of the same member
+PERSIST_SESSIONS = env("PERSIST_SESSIONS", "true").lower() in ("1","true","yes","y")
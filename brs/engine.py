@@ -1,7 +1,11 @@
-import asyncio, httpx, random, time, html as htmllib
-from bs4 import BeautifulSoup
+import asyncio, httpx, random, re, time, html as htmllib
 from urllib.parse import unquote
 from datetime import datetime, timedelta
+from .config import BRS_BASE, PREARM_SWAP, SCAN_DEBUG, CANDIDATE_ORDER, CANDIDATES_PER_ROUND
+from .forms import extract_login_form, has_password_input, extract_booking_form, extract_input_values
+from .parsing import parse
+from .metrics import SWAP_PHASE, SWAP_OUTCOMES
+from . import trace
 
 DEFAULT_UA = ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) "
               "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 "
@@ -15,62 +19,81 @@ def absolutize(base: str, club: str, path: str) -> str:
     if path.startswith("/"):    return base + path
     return f"{base}/{club}/{path}"
 
-class TeeSheetCache:
-    def __init__(self, ttl_seconds=20, base="https://members.brsgolf.com"):
-        self.ttl = ttl_seconds
-        self.base = base
-        self._data = {}  # key -> (ts, json)
-
-    async def fetch(self, client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str):
-        key = (club_slug, course_id, ymd_slash)
-        now = time.time()
-        if key in self._data and (now - self._data[key][0]) < self.ttl:
-            return self._data[key][1]
-        url = f"{self.base}/{club_slug}/tee-sheet/data/{course_id}/{ymd_slash}"
-        r = await client.get(url, headers={"User-Agent": DEFAULT_UA})
-        r.raise_for_status()
-        data = r.json()
-        self._data[key] = (now, data)
-        return data
-
-async def login(client: httpx.AsyncClient, club_slug: str, username: str, password: str, base="https://members.brsgolf.com"):
+async def fetch_sheet(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, base=BRS_BASE) -> dict:
+    url = f"{base}/{club_slug}/tee-sheet/data/{course_id}/{ymd_slash}"
+    r = await client.get(url, headers={"User-Agent": DEFAULT_UA})
+    r.raise_for_status()
+    return r.json()
+
+TOKEN_FIELD = re.compile(r"token|csrf|nonce", re.I)
+
+class LoginRejected(RuntimeError):
+    # BRS answered the login POST with the login form again: wrong username or password
+    pass
+
+class StaleLayout(RuntimeError):
+    # the cached login layout no longer fits the club's login page
+    pass
+
+async def login(client: httpx.AsyncClient, club_slug: str, username: str, password: str, base=BRS_BASE, layouts=None):
+    # layouts: optional per-club cache of the learned login form (see brs.sessions.LoginLayouts)
+    layout = layouts.get(club_slug) if layouts else None
+    if layout:
+        try:
+            return await _login_with_layout(client, club_slug, username, password, layout, base)
+        except StaleLayout:
+            layouts.invalidate(club_slug)  # the page changed under us; learn it again
+        # LoginRejected and server errors propagate: a retry would only repeat them
+
     login_url = f"{base}/{club_slug}/login"
     r = await client.get(login_url, headers={"User-Agent": DEFAULT_UA})
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
-
-    form_el = soup.find("form", attrs={"name": True}) or soup.find("form")
-    if not form_el: raise RuntimeError("Login form not found")
-
-    data = {}
-    for inp in form_el.find_all("input"):
-        nm = inp.get("name"); t = (inp.get("type") or "").lower()
-        if not nm: continue
-        if t in ("checkbox","radio"):
-            if inp.has_attr("checked"): data[nm] = inp.get("value","on")
-        else:
-            data[nm] = inp.get("value","")
+    form = await parse(extract_login_form, r.text)
+    if not form: raise RuntimeError("Login form not found")
+
+    data = form["fields"]
     user_keys = ["login_form[username]","login_form_membership_number","login_form_membership","username","membership_number","login[username]","login[membership_number]"]
     pass_keys = ["login_form[password]","login_form_password","password","login[password]"]
     user_field = next((k for k in user_keys if k in data), None)
     pass_field = next((k for k in pass_keys if k in data), None)
-    if not user_field:
-        cand = form_el.find("input", attrs={"type": ["text","email","tel","number"]})
-        if cand: user_field = cand.get("name")
-    if not pass_field:
-        cand = form_el.find("input", attrs={"type":"password"})
-        if cand: pass_field = cand.get("name")
+    if not user_field and form["text_inputs"]:
+        user_field = form["text_inputs"][0]
+    if not pass_field and form["password_inputs"]:
+        pass_field = form["password_inputs"][0]
     if not user_field or not pass_field:
         raise RuntimeError("Could not detect login fields")
 
-    data[user_field] = username
-    data[pass_field] = password
+    action = absolutize(base, club_slug, form["action"] or login_url)
+    await _post_login(client, action, {**data, user_field: username, pass_field: password})
+
+    if layouts:
+        tokens = [k for k in form["hidden_inputs"] if TOKEN_FIELD.search(k)]
+        layouts.put(club_slug, {
+            "action": action, "user_field": user_field, "pass_field": pass_field, "tokens": tokens,
+            "static": {k: v for k, v in data.items() if k not in tokens and k not in (user_field, pass_field)},
+        })
+
+async def _login_with_layout(client: httpx.AsyncClient, club_slug: str, username: str, password: str, layout: dict, base: str):
+    # known form: fetch the page only for its CSRF tokens, no form detection
+    r = await client.get(f"{base}/{club_slug}/login", headers={"User-Agent": DEFAULT_UA})
+    r.raise_for_status()
+    # the cached field names must still be on the page, or the layout is stale
+    found = extract_input_values(r.text, [*layout["tokens"], layout["user_field"], layout["pass_field"]])
+    if found is None: raise StaleLayout("Cached login layout is stale")
+    tokens = {k: found[k] for k in layout["tokens"]}
+    data = {**layout["static"], **tokens, layout["user_field"]: username, layout["pass_field"]: password}
+    try:
+        await _post_login(client, layout["action"], data)
+    except httpx.HTTPStatusError as e:
+        if 400 <= e.response.status_code < 500:
+            raise StaleLayout(f"Cached login action refused: HTTP {e.response.status_code}") from e
+        raise
 
-    action = absolutize(base, club_slug, form_el.get("action") or login_url)
+async def _post_login(client: httpx.AsyncClient, action: str, data: dict):
     r2 = await client.post(action, data=data, headers={"User-Agent": DEFAULT_UA}, follow_redirects=True)
     r2.raise_for_status()
-    if BeautifulSoup(r2.text, "lxml").find("input", {"type":"password"}):
-        raise RuntimeError("Login failed")
+    if await parse(has_password_input, r2.text):
+        raise LoginRejected("Login failed")
 
 def seats_free(tee: dict) -> tuple[int,int]:
     parts = tee.get("participants") or tee.get("players") or []
@@ -78,11 +101,18 @@ def seats_free(tee: dict) -> tuple[int,int]:
     named = sum(1 for p in parts if (p or {}).get("name"))
     return max(0, total - named), total
 
-def find_candidate_by_free_seats(sheet: dict, earliest: str, latest: str, need: int, accept_at_least=True, debug=False, cap=20):
+CANDIDATE_ORDERS = ("earliest", "closest", "fewest")
+
+def rank_candidates(sheet: dict, earliest: str, latest: str, need: int, accept_at_least=True, order="earliest", prefer_time=None,
+                    debug=False, cap=20, only=None) -> list[str]:
+    # every matching HH:MM, best first: earliest; closest to prefer_time; fewest other players (then earliest)
+    # only: optional set of HH:MM keys to consider (e.g. the slots that changed since the last poll)
     times = (sheet or {}).get("times", {})
     e_min, l_min = to_minutes(earliest), to_minutes(latest)
     shown = 0
-    for hhmm, obj in sorted(times.items()):
+    items = sorted(times.items()) if only is None else sorted((t, times[t]) for t in only if t in times)
+    found = []  # (hhmm, minute of day, other players)
+    for hhmm, obj in items:
         tmin = to_minutes(hhmm)
         if tmin < e_min or tmin > l_min: continue
         tee = obj.get("tee_time") or {}
@@ -92,16 +122,26 @@ def find_candidate_by_free_seats(sheet: dict, earliest: str, latest: str, need:
             print(f"[scan] {hhmm} | free {free}/{total} | bookable={bool(tee.get('bookable'))} | {'OK' if match else 'skip'}")
             shown += 1
         if match:
-            return hhmm
-    return None
+            found.append((hhmm, tmin, total - free))
+    if order == "closest":
+        p_min = to_minutes(prefer_time) if prefer_time else e_min
+        found.sort(key=lambda c: (abs(c[1] - p_min), c[1]))
+    elif order == "fewest":
+        found.sort(key=lambda c: (c[2], c[1]))
+    return [c[0] for c in found]
 
-async def get_book_url_from_sheet(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, hhmm: str, base="https://members.brsgolf.com"):
-    url = f"{base}/{club_slug}/tee-sheet/data/{course_id}/{ymd_slash}"
-    r = await client.get(url, headers={"User-Agent": DEFAULT_UA})
-    r.raise_for_status()
-    data = r.json()
+def find_candidate_by_free_seats(sheet: dict, earliest: str, latest: str, need: int, accept_at_least=True, debug=False, cap=20, only=None):
+    ranked = rank_candidates(sheet, earliest, latest, need, accept_at_least, debug=debug, cap=cap, only=only)
+    return ranked[0] if ranked else None
+
+async def get_book_url_from_sheet(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, hhmm: str, base=BRS_BASE):
+    data = await fetch_sheet(client, club_slug, course_id, ymd_slash, base=base)
+    return book_url_from_sheet(data, club_slug, hhmm, base=base)
+
+def book_url_from_sheet(data: dict, club_slug: str, hhmm: str, base=BRS_BASE):
+    hhmm = hhmm.replace(":","")
     key = f"{hhmm[:2]}:{hhmm[2:]}"
-    slot = (data.get("times") or {}).get(key, {})
+    slot = ((data or {}).get("times") or {}).get(key, {})
     tee = (slot or {}).get("tee_time") or {}
     u = tee.get("url") or ""
     if not u: return None
@@ -113,120 +153,246 @@ async def get_book_url_from_sheet(client: httpx.AsyncClient, club_slug: str, cou
 async def prepare_payload(client: httpx.AsyncClient, book_url: str, player_ids: list[int]):
     r = await client.get(book_url, headers={"User-Agent": DEFAULT_UA, "Referer": book_url})
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
-    form = None
-    for f in soup.find_all("form"):
-        names = " ".join([inp.get("name","") for inp in f.find_all("input")])
-        if "player_1" in names:
-            form = f; break
-    if not form: raise RuntimeError("Booking form not found on book URL")
-
-    fields = {}
-    for inp in form.find_all(["input","select","textarea"]):
-        nm = inp.get("name"); t = (inp.get("type") or "").lower()
-        if not nm: continue
-        if inp.name == "select":
-            sel = inp.find("option", selected=True) or inp.find("option")
-            fields[nm] = sel.get("value","") if sel else fields.get(nm,"")
-        elif t in ("checkbox","radio"):
-            if inp.has_attr("checked"): fields[nm] = inp.get("value","on")
-            elif nm not in fields: fields[nm] = ""
-        else:
-            fields[nm] = inp.get("value","")
+    parsed = await parse(extract_booking_form, r.text)
+    if not parsed: raise RuntimeError("Booking form not found on book URL")
+    action, fields = parsed
     for i, pid in enumerate(player_ids, start=1):
         fields[f"member_booking_form[player_{i}]"] = str(pid)
     vkey = "member_booking_form[vendor-tx-code]"
     fields[vkey] = fields.get(vkey) or f"svc-{int(time.time()*1000)}-{random.randint(100000,999999)}"
 
-    action = form.get("action") or book_url
-    return action, fields
+    return action or book_url, fields
 
 async def post_form(client: httpx.AsyncClient, post_url: str, fields: dict, referer: str):
     r = await client.post(post_url, data=fields, headers={"User-Agent": DEFAULT_UA, "Referer": referer}, follow_redirects=True)
     if r.status_code not in (200, 302): return False
     return True
 
-async def cancel_booking(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, time_hhmm: str, base="https://members.brsgolf.com"):
+async def cancel_booking(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, time_hhmm: str, base=BRS_BASE):
     yyyymmdd = ymd_slash.replace("/", "")
     hhmm4 = time_hhmm.replace(":", "")
     url = f"{base}/{club_slug}/bookings/delete/{course_id}/{yyyymmdd}/{hhmm4}"
     r = await client.post(url, headers={"User-Agent": DEFAULT_UA}, follow_redirects=True)
     return r.status_code in (200, 204, 302)
 
-async def verify_booked(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, hhmm4: str, base="https://members.brsgolf.com"):
-    url = f"{base}/{club_slug}/tee-sheet/data/{course_id}/{ymd_slash}"
-    r = await client.get(url, headers={"User-Agent": DEFAULT_UA})
-    r.raise_for_status()
-    data = r.json()
+async def verify_booked(client: httpx.AsyncClient, club_slug: str, course_id: str, ymd_slash: str, hhmm4: str, base=BRS_BASE):
+    data = await fetch_sheet(client, club_slug, course_id, ymd_slash, base=base)
     key = f"{hhmm4[:2]}:{hhmm4[2:]}"
     slot = (data.get("times") or {}).get(key, {})
     tee = (slot or {}).get("tee_time") or {}
     return (not tee.get("bookable")), [ (p or {}).get("name") for p in (tee.get("players") or tee.get("participants") or []) ]
 
-async def run_swapper_job(cfg: dict, log=print):
-    base = "https://members.brsgolf.com"
-    timeout = httpx.Timeout(30.0, connect=15.0)
-    async with httpx.AsyncClient(base_url=base, timeout=timeout) as client:
-        await login(client, cfg["club_slug"], cfg["username"], cfg["password"], base=base)
-        log("Logged in ✔")
+def _reason(e: Exception) -> str:
+    return f"HTTP {e.response.status_code}" if isinstance(e, httpx.HTTPStatusError) else str(e)
 
-        cache = TeeSheetCache(ttl_seconds=max(5, int(cfg.get("poll_seconds", 20))))
+def _print_log(msg: str, **event):
+    print(msg)
+
+def _observe_attempt(tr: trace.Trace):
+    for sp in tr.spans:
+        SWAP_PHASE.observe(sp["ms"] / 1000, phase=sp["name"])
+    SWAP_OUTCOMES.inc(outcome=tr.attrs.get("outcome", "unknown"))
+
+trace.GLOBAL_SINKS.append(_observe_attempt)
+
+# lost to someone else (nothing on our side is broken): the next candidate from the same sheets may still work
+FALL_THROUGH = {"race_lost", "book_failed", "no_book_url", "slot_gone"}
+
+def job_targets(cfg: dict) -> list[tuple[str, str]]:
+    # (course_id, YYYY/MM/DD) sheets to watch, most preferred first; by default just the booked one
+    ts = [(str(c), d) for c, d in (cfg.get("targets") or ())]
+    return list(dict.fromkeys(ts)) or [_booked(cfg)]
+
+def _booked(cfg: dict) -> tuple[str, str]:
+    # where the booking being swapped out lives
+    return str(cfg["course_id"]), cfg["target_date"]
+
+async def run_swapper_job(cfg: dict, log=_print_log, sheets=None, sessions=None, trace_sink=None):
+    # log(msg, phase=..., slot=..., latency_ms=...): phase/slot/latency feed the job event log
+    # trace_sink(Trace): called with the timing trace of every swap attempt
+    if trace_sink: trace.use_sink(trace_sink)
+    from .sheets import SheetHub
+    from .sessions import SessionPool
+    base = BRS_BASE
+    pool = sessions or SessionPool(base=base, persist=False)
+    try:
+        return await _run_with_pool(cfg, log, sheets or SheetHub(base=base), pool, base)
+    finally:
+        if sessions is None: await pool.close()
+
+async def _run_with_pool(cfg: dict, log, hub, pool, base: str):
+    async with pool.session(cfg["club_slug"], cfg["username"], cfg["password"]) as client:
+        log("Logged in ✔", phase="login")
+
+        window = (cfg["earliest"], cfg["latest"], int(cfg.get("required_seats", 4)), bool(cfg.get("accept_at_least", True)))
+        targets = job_targets(cfg)
+        group = hub.subscribe_group(client, cfg["club_slug"], targets, poll_seconds=int(cfg.get("poll_seconds", 20)), window=window)
         deadline = datetime.utcnow() + timedelta(minutes=int(cfg.get("max_minutes", 120)))
+        try:
+            return await _swap_loop(client, cfg, group, targets, deadline, base, log)
+        finally:
+            group.close()
 
-        while datetime.utcnow() < deadline:
-            sheet = await cache.fetch(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"])
-            cand_hhmm = find_candidate_by_free_seats(
-                sheet,
+async def _swap_loop(client: httpx.AsyncClient, cfg: dict, group, targets: list, deadline: datetime, base: str, log):
+    poll = int(cfg.get("poll_seconds", 20))
+    prearm = bool(cfg.get("prearm", PREARM_SWAP))
+    order = cfg.get("prefer") or CANDIDATE_ORDER
+    per_round = int(cfg.get("candidates_per_round", CANDIDATES_PER_ROUND))
+    rescan = set(targets)
+    latest: dict[tuple, dict] = {}  # newest sheet per target, for the pre-armed rollback
+    while datetime.utcnow() < deadline:
+        ups = await group.next(timeout=(deadline - datetime.utcnow()).total_seconds())
+        cands = []
+        for where, upd in ups:  # most preferred target first
+            latest[where] = upd.sheet
+            only = None
+            if not (upd.full or where in rescan):
+                # only slots that changed and now have free seats can newly match
+                only = {c.time for c in upd.changes if c.free_after}
+                if not only: continue
+            rescan.discard(where)
+            ranked = rank_candidates(
+                upd.sheet,
                 cfg["earliest"], cfg["latest"],
                 int(cfg.get("required_seats", 4)),
                 accept_at_least=bool(cfg.get("accept_at_least", True)),
-                debug=True, cap=25
+                order=order, prefer_time=cfg.get("prefer_time"),
+                debug=SCAN_DEBUG, cap=25, only=only
             )
-            if not cand_hhmm:
-                await asyncio.sleep(int(cfg.get("poll_seconds", 20))); continue
-
-            log(f"Found candidate by free seats: {cand_hhmm}")
-            ok_cancel = await cancel_booking(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"], cfg["current_time"], base=base)
-            if not ok_cancel:
-                log("Cancel failed; will retry after short sleep.")
-                await asyncio.sleep(int(cfg.get("poll_seconds", 20))); continue
-
-            new_hhmm = cand_hhmm
-            new_hhmm4 = new_hhmm.replace(":","")
-
-            async def fetch_book_url_retry(target, tries=6, wait=0.5):
-                for _ in range(tries):
-                    u = await get_book_url_from_sheet(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"], target.replace(":",""), base=base)
-                    if u: return u
-                    await asyncio.sleep(wait)
-                return None
-
-            new_book_url = await fetch_book_url_retry(new_hhmm)
-            if not new_book_url:
-                log("Could not obtain tokenised book URL; attempting to re-book original.")
-                orig_book_url = await fetch_book_url_retry(cfg["current_time"])
-                if orig_book_url:
-                    post_u, fields = await prepare_payload(client, orig_book_url, cfg["player_ids"])
-                    ok_rb = await post_form(client, post_u, fields, orig_book_url)
-                    log(f"Re-book original {'OK' if ok_rb else 'failed'}")
-                return {"status":"failed", "reason":"no_book_url"}
+            cands += [(where, upd, hhmm) for hhmm in ranked]
+        if not cands:
+            continue
+
+        swap = _prearmed_swap if prearm else _swap
+        for rank, (where, upd, cand_hhmm) in enumerate(cands[:per_round], start=1):
+            on = f" (course {where[0]}, {where[1]})" if len(targets) > 1 else ""
+            if rank == 1:
+                log(f"Found candidate by free seats: {cand_hhmm}{on}", phase="candidate", slot=cand_hhmm)
+            else:
+                log(f"Trying next candidate #{rank}: {cand_hhmm}{on}", phase="candidate", slot=cand_hhmm)
+            with trace.attempt("swap", slot=cand_hhmm, sheet="/".join(where), rank=rank, mode="prearmed" if prearm else "sequential") as tr:
+                trace.record("detect", max(0.0, time.time() - upd.fetched_at))  # sheet fetched -> candidate picked
+                result = await swap(client, cfg, where, upd.sheet, latest.get(_booked(cfg)), cand_hhmm, base, log)
+            if result: return result
+            # cancel trouble, or the original could not be re-booked: back off instead
+            if tr.attrs.get("outcome") not in FALL_THROUGH or tr.attrs.get("rolled_back") is False: break
+        rescan = set(targets)  # the candidates may still be free; look at the whole sheets again
+        await asyncio.sleep(poll)
+
+    return {"status":"expired"}
+
+async def _fetch_book_url_retry(client: httpx.AsyncClient, cfg: dict, where: tuple, target: str, base: str, tries=6, wait=0.5):
+    for i in range(tries):
+        with trace.span("book_url", slot=target, attempt=i + 1):
+            u = await get_book_url_from_sheet(client, cfg["club_slug"], *where, target.replace(":",""), base=base)
+        if u: return u
+        await asyncio.sleep(wait)
+    return None
+
+async def _rebook_original(client: httpx.AsyncClient, cfg: dict, base: str, log, armed=None):
+    with trace.span("rollback", slot=cfg["current_time"], armed=bool(armed)):
+        ok = await _rebook_original_untimed(client, cfg, base, log, armed)
+    trace.note(rolled_back=ok)
+    return ok
+
+async def _rebook_original_untimed(client: httpx.AsyncClient, cfg: dict, base: str, log, armed=None):
+    # armed: (book_url, post_url, fields) prepared before the cancel
+    if armed:
+        orig_book_url, post_u, fields = armed
+        if await post_form(client, post_u, fields, orig_book_url):
+            log("Re-book original OK (pre-armed)", phase="rollback", slot=cfg["current_time"])
+            return True
+    orig_book_url = await _fetch_book_url_retry(client, cfg, _booked(cfg), cfg["current_time"], base)
+    if not orig_book_url:
+        return False
+    post_u, fields = await prepare_payload(client, orig_book_url, cfg["player_ids"])
+    ok_rb = await post_form(client, post_u, fields, orig_book_url)
+    log(f"Re-book original {'OK' if ok_rb else 'failed'}", phase="rollback", slot=cfg["current_time"])
+    return ok_rb
 
+async def _swap(client: httpx.AsyncClient, cfg: dict, where: tuple, sheet: dict, orig_sheet: dict | None, new_hhmm: str, base: str, log):
+    with trace.span("cancel", slot=cfg["current_time"]):
+        ok_cancel = await cancel_booking(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"], cfg["current_time"], base=base)
+    if not ok_cancel:
+        trace.note(outcome="cancel_failed")
+        log("Cancel failed; will retry after short sleep.", phase="cancel", slot=cfg["current_time"])
+        return None
+    t_cancel = time.perf_counter()
+
+    new_book_url = await _fetch_book_url_retry(client, cfg, where, new_hhmm, base)
+    if not new_book_url:
+        trace.note(outcome="no_book_url")
+        log("Could not obtain tokenised book URL; attempting to re-book original.", phase="book", slot=new_hhmm)
+        await _rebook_original(client, cfg, base, log)
+        return None
+
+    try:
+        with trace.span("prepare", slot=new_hhmm):
             post_u, fields = await prepare_payload(client, new_book_url, cfg["player_ids"])
-            ok_book = await post_form(client, post_u, fields, new_book_url)
-            if ok_book:
-                stuck, players = await verify_booked(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"], new_hhmm4, base=base)
-                if stuck:
-                    log(f"✅ Booked {new_hhmm}. Players: {players}")
-                    return {"status":"success", "time": new_hhmm, "players": players}
-                else:
-                    log("POST ok but slot still bookable — race; trying to re-book original.")
-
-            orig_book_url = await fetch_book_url_retry(cfg["current_time"])
-            if orig_book_url:
-                post_u, fields = await prepare_payload(client, orig_book_url, cfg["player_ids"])
-                ok_rb = await post_form(client, post_u, fields, orig_book_url)
-                log(f"Re-book original {'OK' if ok_rb else 'failed'}")
-
-            await asyncio.sleep(int(cfg.get("poll_seconds", 20)))
-
-        return {"status":"expired"}
+    except (httpx.HTTPStatusError, RuntimeError) as e:
+        trace.note(outcome="slot_gone")
+        log(f"Booking page for {new_hhmm} refused ({_reason(e)}); attempting to re-book original.", phase="book", slot=new_hhmm)
+        await _rebook_original(client, cfg, base, log)
+        return None
+    with trace.span("book", slot=new_hhmm):
+        ok_book = await post_form(client, post_u, fields, new_book_url)
+    gap_ms = round((time.perf_counter() - t_cancel) * 1000, 1)
+    log(f"Cancel→book gap {gap_ms} ms", phase="swap", slot=new_hhmm, latency_ms=gap_ms)
+    return await _verify_or_rollback(client, cfg, where, new_hhmm, ok_book, gap_ms, base, log)
+
+async def _prearmed_swap(client: httpx.AsyncClient, cfg: dict, where: tuple, sheet: dict, orig_sheet: dict | None, new_hhmm: str, base: str, log):
+    # Resolve and build both payloads first so the cancel→book window is two POSTs.
+    new_book_url = book_url_from_sheet(sheet, cfg["club_slug"], new_hhmm, base=base)
+    if not new_book_url:
+        with trace.span("book_url", slot=new_hhmm):
+            new_book_url = await get_book_url_from_sheet(client, cfg["club_slug"], *where, new_hhmm.replace(":",""), base=base)
+    if not new_book_url:
+        trace.note(outcome="no_book_url")
+        log("No tokenised book URL for candidate yet; not cancelling.", phase="book", slot=new_hhmm)
+        return None
+    try:
+        with trace.span("prepare", slot=new_hhmm):
+            post_u, fields = await prepare_payload(client, new_book_url, cfg["player_ids"])
+    except (httpx.HTTPStatusError, RuntimeError) as e:
+        # usually someone else booked it since the sheet was fetched (stale token: 403)
+        trace.note(outcome="slot_gone")
+        log(f"Booking page for {new_hhmm} refused ({_reason(e)}); not cancelling.", phase="book", slot=new_hhmm)
+        return None
+
+    armed = None
+    # the booked slot is on orig_sheet: the candidate's own sheet unless the job watches several
+    orig_book_url = book_url_from_sheet(orig_sheet, cfg["club_slug"], cfg["current_time"], base=base) if orig_sheet else None
+    if orig_book_url:
+        try:
+            with trace.span("prepare_rollback", slot=cfg["current_time"]):
+                armed = (orig_book_url, *await prepare_payload(client, orig_book_url, cfg["player_ids"]))
+        except Exception as e:
+            log(f"Could not pre-arm rollback: {e}", phase="prearm")
+
+    with trace.span("cancel", slot=cfg["current_time"]):
+        ok_cancel = await cancel_booking(client, cfg["club_slug"], cfg["course_id"], cfg["target_date"], cfg["current_time"], base=base)
+    t_cancel = time.perf_counter()
+    if not ok_cancel:
+        trace.note(outcome="cancel_failed")
+        log("Cancel failed; will retry after short sleep.", phase="cancel", slot=cfg["current_time"])
+        return None
+    with trace.span("book", slot=new_hhmm):
+        ok_book = await post_form(client, post_u, fields, new_book_url)
+    gap_ms = round((time.perf_counter() - t_cancel) * 1000, 1)
+    log(f"Cancel→book gap {gap_ms} ms (pre-armed)", phase="swap", slot=new_hhmm, latency_ms=gap_ms)
+    return await _verify_or_rollback(client, cfg, where, new_hhmm, ok_book, gap_ms, base, log, armed=armed)
+
+async def _verify_or_rollback(client: httpx.AsyncClient, cfg: dict, where: tuple, new_hhmm: str, ok_book: bool, gap_ms: float, base: str, log, armed=None):
+    if ok_book:
+        with trace.span("verify", slot=new_hhmm):
+            stuck, players = await verify_booked(client, cfg["club_slug"], *where, new_hhmm.replace(":",""), base=base)
+        if stuck:
+            trace.note(outcome="success")
+            log(f"✅ Booked {new_hhmm} (course {where[0]}, {where[1]}). Players: {players}", phase="verify", slot=new_hhmm)
+            return {"status":"success", "time": new_hhmm, "course_id": where[0], "date": where[1], "players": players, "gap_ms": gap_ms}
+        trace.note(outcome="race_lost")
+        log("POST ok but slot still bookable — race; trying to re-book original.", phase="verify", slot=new_hhmm)
+    else:
+        trace.note(outcome="book_failed")
+    await _rebook_original(client, cfg, base, log, armed=armed)
+    return None
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, bindparam, func
+from .models import SessionLocal, Job, JobEvent
+from .config import EVENT_FLUSH_SECONDS, EVENT_BATCH, EVENT_QUEUE_MAX, EVENT_RETENTION_DAYS, EVENT_KEEP_PER_JOB
+
+# Per-job event log (login, candidate, cancel, book, rollback, result...).
+# Jobs emit() without touching the DB; one writer task flushes batches in a
+# single short transaction. An event identical to the job's previous one
+# (same phase/slot/message) bumps that row's count instead of adding a row.
+
+class EventWriter:
+    def __init__(self, flush_seconds=EVENT_FLUSH_SECONDS, batch=EVENT_BATCH, queue_max=EVENT_QUEUE_MAX):
+        self.flush_seconds = flush_seconds
+        self.batch = batch
+        self.queue_max = queue_max
+        self.dropped = 0
+        self._pending: list[dict] = []
+        self._last: dict[int, tuple[tuple, object]] = {}  # job_id -> (key, pending dict or row id)
+        self._repeats: dict[int, tuple[int, datetime]] = {}  # row id -> (extra count, last ts)
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+    def emit(self, job_id: int, phase: str, message: str = "", slot: str | None = None, latency_ms: float | None = None):
+        now = datetime.utcnow()
+        key = (phase, slot, message)
+        last = self._last.get(job_id)
+        if last and last[0] == key:
+            ref = last[1]
+            if isinstance(ref, dict):
+                ref["count"] += 1; ref["last_ts"] = now
+            else:
+                n, _ = self._repeats.get(ref, (0, now))
+                self._repeats[ref] = (n + 1, now)
+            return
+        if len(self._pending) >= self.queue_max:
+            self.dropped += 1
+            return
+        ev = {"job_id": job_id, "ts": now, "last_ts": None, "phase": phase, "slot": slot,
+              "latency_ms": latency_ms, "message": message[:2000], "count": 1}
+        self._pending.append(ev)
+        self._last[job_id] = (key, ev)
+        if len(self._pending) >= self.batch:
+            self._wake.set()
+
+    def forget(self, job_id: int):
+        self._last.pop(job_id, None)
+
+    def flush(self):
+        rows, self._pending = self._pending, []
+        repeats, self._repeats = self._repeats, {}
+        if not rows and not repeats: return
+        db = SessionLocal()
+        try:
+            objs = [JobEvent(**r) for r in rows]
+            db.add_all(objs)
+            if repeats:
+                t = JobEvent.__table__
+                db.execute(
+                    update(t).where(t.c.id == bindparam("rid")).values(count=t.c.count + bindparam("n"), last_ts=bindparam("lts")),
+                    [{"rid": rid, "n": n, "lts": ts} for rid, (n, ts) in repeats.items()],
+                )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[events] flush of {len(rows)} events failed: {e}")
+            return
+        finally:
+            db.close()
+        # later repeats of a just-written event update its row by id
+        for r, o in zip(rows, objs):
+            last = self._last.get(r["job_id"])
+            if last and last[1] is r:
+                self._last[r["job_id"]] = (last[0], o.id)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            self.flush()
+
+
+def compact(db, retention_days=EVENT_RETENTION_DAYS, keep_per_job=EVENT_KEEP_PER_JOB) -> int:
+    # drop events past retention, of deleted jobs, and all but the newest keep_per_job rows of each job
+    n = db.execute(delete(JobEvent).where(JobEvent.ts < datetime.utcnow() - timedelta(days=retention_days))).rowcount
+    n += db.execute(delete(JobEvent).where(JobEvent.job_id.notin_(select(Job.id)))).rowcount
+    over = db.execute(
+        select(JobEvent.job_id).group_by(JobEvent.job_id).having(func.count() > keep_per_job)
+    ).scalars().all()
+    for jid in over:
+        cutoff = db.scalar(
+            select(JobEvent.id).where(JobEvent.job_id == jid)
+            .order_by(JobEvent.id.desc()).offset(keep_per_job - 1).limit(1)
+        )
+        n += db.execute(delete(JobEvent).where(JobEvent.job_id == jid, JobEvent.id < cutoff)).rowcount
+    db.commit()
+    return n
+
+def tail(db, job_id: int, after: int | None = None, limit=100) -> list[JobEvent]:
+    # events after id `after` (oldest first), or the newest `limit` if no cursor
+    q = select(JobEvent).where(JobEvent.job_id == job_id)
+    if after is not None:
+        return db.scalars(q.where(JobEvent.id > after).order_by(JobEvent.id).limit(limit)).all()
+    return list(reversed(db.scalars(q.order_by(JobEvent.id.desc()).limit(limit)).all()))
@@ -0,0 +1,79 @@
+import re, html as htmllib
+from lxml import etree, html as lhtml
+
+# Lean form extraction for the few BRS pages we parse (login, booking, store).
+# lxml builds the tree in C and the XPath below only walks <form> elements, which
+# is several times cheaper than a full BeautifulSoup parse. Everything returns
+# plain dicts/tuples so it can be shipped to a process pool.
+
+def _doc(text):
+    if isinstance(text, str) and text.lstrip().startswith("<?xml"):
+        text = text.encode()
+    try:
+        return lhtml.fromstring(text)
+    except (etree.ParserError, ValueError):
+        return None
+
+def _forms(doc) -> list:
+    return doc.xpath("//form") if doc is not None else []
+
+def _fields(form, tags=("input",), keep_unchecked=False) -> dict:
+    fields = {}
+    for el in form.iter(*tags):
+        nm = el.get("name")
+        if not nm: continue
+        t = (el.get("type") or "").lower()
+        if el.tag == "select":
+            opts = el.xpath(".//option")
+            sel = next((o for o in opts if o.get("selected") is not None), opts[0] if opts else None)
+            fields[nm] = sel.get("value", "") if sel is not None else fields.get(nm, "")
+        elif t in ("checkbox", "radio"):
+            if el.get("checked") is not None: fields[nm] = el.get("value", "on")
+            elif keep_unchecked and nm not in fields: fields[nm] = ""
+        else:
+            fields[nm] = el.get("value", "")
+    return fields
+
+def extract_login_form(text) -> dict | None:
+    # {"action", "fields", "text_inputs", "password_inputs"} for the login form, or None
+    forms = _forms(_doc(text))
+    if not forms: return None
+    form = next((f for f in forms if f.get("name") is not None), forms[0])
+    inputs = form.xpath(".//input")
+    return {
+        "action": form.get("action"),
+        "fields": _fields(form),
+        "text_inputs": [i.get("name") for i in inputs if (i.get("type") or "") in ("text", "email", "tel", "number")],
+        "password_inputs": [i.get("name") for i in inputs if i.get("type") == "password"],
+        "hidden_inputs": [i.get("name") for i in inputs if (i.get("type") or "").lower() == "hidden" and i.get("name")],
+    }
+
+def has_password_input(text) -> bool:
+    doc = _doc(text)
+    return doc is not None and bool(doc.xpath("//input[@type='password']"))
+
+def extract_booking_form(text, marker="player_1") -> tuple[str | None, dict] | None:
+    # (action, fields) of the first form with an input whose name contains marker
+    for form in _forms(_doc(text)):
+        if any(marker in (i.get("name") or "") for i in form.iter("input")):
+            return form.get("action"), _fields(form, ("input", "select", "textarea"), keep_unchecked=True)
+    return None
+
+def find_autocomplete_url(text) -> str | None:
+    doc = _doc(text)
+    if doc is None: return None
+    els = doc.xpath("//input[@name='member_booking_form[player_1_text]']") or doc.xpath("//input[@data-autocomplete-url]")
+    return els[0].get("data-autocomplete-url") if els else None
+
+_VALUE = re.compile(r"""(?<![\w-])value\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+
+def extract_input_values(text: str, names) -> dict | None:
+    # regex scan for the value= of specific named inputs (e.g. CSRF tokens) without
+    # parsing the page; None if any of them is missing
+    out = {}
+    for nm in names:
+        m = re.search(r"<input\b[^>]*\bname\s*=\s*[\"']" + re.escape(nm) + r"[\"'][^>]*>", text, re.I)
+        if not m: return None
+        v = _VALUE.search(m.group(0))
+        out[nm] = htmllib.unescape(next((g for g in v.groups() if g is not None), "")) if v else ""
+    return out
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.orm import Session
+from .models import Job
+
+# Lease-based job ownership so several worker processes can share one jobs
+# table. A worker owns a job while its lease is fresh; expired leases (dead
+# worker) are reclaimed by whoever scans next. Lease writes leave updated_at
+# alone so heartbeats don't look like user edits.
+
+CLAIMABLE_STATUSES = ("active", "running")
+
+def _claimable(worker_id: str, now: datetime):
+    return and_(
+        Job.status.in_(CLAIMABLE_STATUSES),
+        or_(Job.owner_id.is_(None), Job.owner_id == worker_id, Job.lease_expires_at < now),
+    )
+
+def claim_jobs(db: Session, worker_id: str, limit: int, lease_seconds: int, exclude=(), only=None) -> list[int]:
+    # only: restrict the claim to these job ids (e.g. ones we were just notified about)
+    if limit <= 0 or only is not None and not only: return []
+    now = datetime.utcnow()
+    values = dict(owner_id=worker_id, lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now, updated_at=Job.updated_at)
+    q = select(Job.id).where(_claimable(worker_id, now)).order_by(Job.id).limit(limit)
+    if exclude:
+        q = q.where(Job.id.notin_(list(exclude)))
+    if only is not None:
+        q = q.where(Job.id.in_(list(only)))
+
+    if db.bind.dialect.name == "postgresql":
+        ids = list(db.scalars(q.with_for_update(skip_locked=True)))
+        if ids:
+            db.execute(update(Job).where(Job.id.in_(ids)).values(**values))
+        db.commit()
+        return ids
+
+    # SQLite has no row locks: claim each row with a conditional UPDATE and keep the ones we won
+    ids = []
+    for jid in list(db.scalars(q)):
+        res = db.execute(update(Job).where(Job.id == jid, _claimable(worker_id, now)).values(**values))
+        if res.rowcount:
+            ids.append(jid)
+    db.commit()
+    return ids
+
+def renew_leases(db: Session, worker_id: str, ids, lease_seconds: int) -> set[int]:
+    # extend our leases; returns the ids we still own (others were taken over)
+    ids = list(ids)
+    if not ids: return set()
+    now = datetime.utcnow()
+    db.execute(
+        update(Job).where(Job.id.in_(ids), Job.owner_id == worker_id)
+                   .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now, updated_at=Job.updated_at)
+    )
+    db.commit()
+    return set(db.scalars(select(Job.id).where(Job.id.in_(ids), Job.owner_id == worker_id)))
+
+def release(db: Session, worker_id: str, job_id: int):
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.owner_id == worker_id)
+                   .values(owner_id=None, lease_expires_at=None, updated_at=Job.updated_at)
+    )
+    db.commit()
+
+def release_all(db: Session, worker_id: str):
+    db.execute(
+        update(Job).where(Job.owner_id == worker_id)
+                   .values(owner_id=None, lease_expires_at=None, updated_at=Job.updated_at)
+    )
+    db.commit()
@@ -0,0 +1,72 @@
+from .engine import to_minutes
+
+# Stabbing-query index over job time windows: given a slot's minute-of-day and
+# free seats, return every job that would accept it in O(log n + k).
+
+class IntervalTree:
+    def __init__(self, intervals: list[tuple[int, int, object]]):
+        self.root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals: return None
+        points = sorted(p for lo, hi, _ in intervals for p in (lo, hi))
+        center = points[len(points) // 2]
+        left = [iv for iv in intervals if iv[1] < center]
+        right = [iv for iv in intervals if iv[0] > center]
+        here = [iv for iv in intervals if iv[0] <= center <= iv[1]]
+        return (
+            center,
+            sorted(here, key=lambda iv: iv[0]),
+            sorted(here, key=lambda iv: -iv[1]),
+            self._build(left),
+            self._build(right),
+        )
+
+    def query(self, x: int) -> list:
+        out, node = [], self.root
+        while node:
+            center, by_lo, by_hi, left, right = node
+            if x < center:
+                for lo, hi, item in by_lo:
+                    if lo > x: break
+                    out.append(item)
+                node = left
+            elif x > center:
+                for lo, hi, item in by_hi:
+                    if hi < x: break
+                    out.append(item)
+                node = right
+            else:
+                out.extend(item for _, _, item in by_lo)
+                break
+        return out
+
+
+class JobIndex:
+    # one interval tree per (required_seats, accept_at_least) bucket, rebuilt lazily on change
+    def __init__(self):
+        self._items: dict[object, tuple] = {}
+        self._trees: dict[tuple, IntervalTree] | None = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item, earliest: str, latest: str, need: int, accept_at_least=True):
+        self._items[item] = (to_minutes(earliest), to_minutes(latest), int(need), bool(accept_at_least))
+        self._trees = None
+
+    def remove(self, item):
+        if self._items.pop(item, None) is not None:
+            self._trees = None
+
+    def query(self, minute: int, free: int) -> list:
+        if self._trees is None:
+            buckets: dict[tuple, list] = {}
+            for item, (lo, hi, need, at_least) in self._items.items():
+                buckets.setdefault((need, at_least), []).append((lo, hi, item))
+            self._trees = {k: IntervalTree(v) for k, v in buckets.items()}
+        out = []
+        for (need, at_least), tree in self._trees.items():
+            if free == need or (at_least and free > need):
+                out.extend(tree.query(minute))
+        return out
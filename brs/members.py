@@ -0,0 +1,81 @@
+import bisect, re, time
+
+# Per-club caches for player search: the member autocomplete URL (found by
+# opening a booking page) and a directory of members seen in autocomplete
+# answers. A query is answered locally when it refines an earlier upstream
+# query that came back complete (fewer results than the upstream cap).
+
+def _words(s: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", s.lower())
+
+
+class _Directory:
+    def __init__(self):
+        self.names: dict[int, str] = {}            # member id -> display text
+        self.seen: dict[int, float] = {}           # member id -> last confirmed upstream
+        self.words: list[tuple[str, int]] = []     # sorted (word, id) for prefix lookups
+        self.queries: dict[str, float] = {}        # complete upstream query -> fetched at
+
+    def put(self, pid: int, text: str, now: float):
+        if self.names.get(pid) != text:
+            if pid in self.names: self.words = [w for w in self.words if w[1] != pid]
+            self.names[pid] = text
+            for w in set(_words(text)):
+                bisect.insort(self.words, (w, pid))
+        self.seen[pid] = now
+
+    def prefix(self, w: str) -> set[int]:
+        i = bisect.bisect_left(self.words, (w, -1))
+        out = set()
+        while i < len(self.words) and self.words[i][0].startswith(w):
+            out.add(self.words[i][1]); i += 1
+        return out
+
+    def prune(self, cutoff: float):
+        for q in [q for q, ts in self.queries.items() if ts < cutoff]:
+            del self.queries[q]
+        stale = {pid for pid, ts in self.seen.items() if ts < cutoff}
+        if stale:
+            for pid in stale:
+                del self.names[pid], self.seen[pid]
+            self.words = [w for w in self.words if w[1] not in stale]
+
+
+class MemberCache:
+    def __init__(self, ttl=6 * 3600, url_ttl=24 * 3600, cap=10):
+        # cap: result count at which an upstream answer is assumed truncated
+        self.ttl, self.url_ttl, self.cap = ttl, url_ttl, cap
+        self._urls: dict[str, tuple[str, float]] = {}
+        self._dirs: dict[str, _Directory] = {}
+
+    def autocomplete_url(self, club: str) -> str | None:
+        hit = self._urls.get(club)
+        return hit[0] if hit and hit[1] > time.time() else None
+
+    def set_autocomplete_url(self, club: str, url: str):
+        self._urls[club] = (url, time.time() + self.url_ttl)
+
+    def forget_autocomplete_url(self, club: str):
+        self._urls.pop(club, None)
+
+    def lookup(self, club: str, q: str) -> list[dict] | None:
+        # local answer, or None if the query has to go upstream
+        d = self._dirs.get(club)
+        words = _words(q)
+        if not d or not words: return None
+        d.prune(time.time() - self.ttl)
+        key = " ".join(words)
+        if not any(key.startswith(prev) for prev in d.queries): return None
+        ids = set.intersection(*(d.prefix(w) for w in words))
+        return [{"id": pid, "text": d.names[pid]} for pid in sorted(ids, key=lambda p: d.names[p])]
+
+    def store(self, club: str, q: str, results: list[dict]):
+        d = self._dirs.setdefault(club, _Directory())
+        now = time.time()
+        for r in results:
+            d.put(r["id"], r["text"], now)
+        # only a complete answer whose members all match by word prefix can stand in for refinements
+        words = _words(q)
+        if words and len(results) < self.cap and all(
+                all(any(nw.startswith(w) for nw in _words(r["text"])) for w in words) for r in results):
+            d.queries[" ".join(words)] = now
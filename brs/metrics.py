@@ -0,0 +1,148 @@
+import asyncio, bisect, math, threading, time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics (counters, gauges, histograms with
+# labels), no client library needed. Each process (web, worker) has its own
+# REGISTRY; the worker serves it on METRICS_PORT, the web app on /metrics.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, kw) -> tuple:
+        return tuple(str(kw.get(l, "")) for l in self.labels)
+
+    def _fmt(self, key, extra=()) -> str:
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs: return ""
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{self._fmt(k)} {v:g}" for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        # fn: read at scrape time, returning a number or {label tuple: number}
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def set(self, v: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = v
+
+    def _samples(self):
+        if self.fn:
+            try:
+                v = self.fn()
+            except Exception:
+                return []
+            items = v.items() if isinstance(v, dict) else [((), v)]
+            return [f"{self.name}{self._fmt(k if isinstance(k, tuple) else (k,))} {x:g}" for k, x in items]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, v: float, **labels):
+        k = self._key(labels)
+        with self._lock:
+            h = self._values.get(k)
+            if h is None:
+                h = self._values[k] = [[0] * (len(self.buckets) + 1), 0.0]
+            h[0][bisect.bisect_left(self.buckets, v)] += 1
+            h[1] += v
+
+    @contextmanager
+    def time(self, **labels):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t, **labels)
+
+    def _samples(self):
+        out = []
+        with self._lock:
+            for k, (counts, total) in self._values.items():
+                acc = 0
+                for le, c in zip(self.buckets + (math.inf,), counts):
+                    acc += c
+                    out.append(f"{self.name}_bucket{self._fmt(k, [('le', '+Inf' if le == math.inf else f'{le:g}')])} {acc}")
+                out.append(f"{self.name}_sum{self._fmt(k)} {total:g}")
+                out.append(f"{self.name}_count{self._fmt(k)} {acc}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def add(self, m: _Metric) -> _Metric:
+        return self._metrics.setdefault(m.name, m)
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics.values() for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+def counter(name, help, labels=()) -> Counter:
+    return REGISTRY.add(Counter(name, help, labels))
+
+def gauge(name, help, labels=(), fn=None) -> Gauge:
+    return REGISTRY.add(Gauge(name, help, labels, fn))
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.add(Histogram(name, help, labels, buckets))
+
+
+# shared by web and worker
+UPSTREAM_REQUESTS = counter("brs_upstream_requests_total", "Requests to BRS by club (empty: logins, slug probes) and status class", ("club", "method", "status"))
+UPSTREAM_LATENCY = histogram("brs_upstream_request_seconds", "BRS response time (to headers) by club", ("club", "method"))
+SWAP_PHASE = histogram("brs_swap_phase_seconds", "Swap phase durations: detect, cancel, book, verify", ("phase",))
+SWAP_OUTCOMES = counter("brs_swap_attempts_total", "Swap attempts by outcome", ("outcome",))
+
+
+async def serve(port: int, host="0.0.0.0"):
+    # bare-bones HTTP endpoint for the worker: every request gets the metrics page
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = REGISTRY.render().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle, host, port)
@@ -1,6 +1,7 @@
+import json
 from datetime import datetime
 from sqlalchemy import (
-    create_engine, String, Integer, LargeBinary, Boolean, DateTime, Text,
+    create_engine, inspect, text, String, Integer, Float, LargeBinary, Boolean, DateTime, Text,
     UniqueConstraint, ForeignKey
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
@@ -30,11 +31,14 @@ class Job(Base):
     member_password_enc: Mapped[bytes] = mapped_column(LargeBinary)
 
     target_date: Mapped[str] = mapped_column(String(10))  # YYYY/MM/DD
+    targets: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON [[course_id, date], …] to watch, preferred first; None: just the booked one
     earliest: Mapped[str] = mapped_column(String(5))      # HH:MM
     latest: Mapped[str] = mapped_column(String(5))        # HH:MM
     current_time: Mapped[str] = mapped_column(String(5))  # HH:MM
     required_seats: Mapped[int] = mapped_column(Integer, default=4)
     accept_at_least: Mapped[bool] = mapped_column(Boolean, default=True)
+    prefer: Mapped[str | None] = mapped_column(String(16), nullable=True)  # candidate order, see engine.rank_candidates; None: CANDIDATE_ORDER
+    prefer_time: Mapped[str | None] = mapped_column(String(5), nullable=True)  # HH:MM for prefer="closest"
     player_ids_csv: Mapped[str] = mapped_column(String(255))
 
     poll_seconds: Mapped[int] = mapped_column(Integer, default=20)
@@ -42,27 +46,76 @@ class Job(Base):
 
     status: Mapped[str] = mapped_column(String(20), default="active")  # active, running, success, failed, expired, stopped
     last_log: Mapped[str] = mapped_column(Text, default="")
+    traces: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON: timing traces of recent swap attempts, see brs.trace
     started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # worker lease: which worker process owns the job and until when
+    owner_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
     user: Mapped["User"] = relationship(back_populates="jobs")
 
     def player_ids(self) -> list[int]:
         return [int(x.strip()) for x in self.player_ids_csv.split(",") if x.strip()]
 
+    def target_list(self) -> list[tuple[str, str]]:
+        try:
+            return [(str(c), d) for c, d in json.loads(self.targets)] if self.targets else [(self.course_id, self.target_date)]
+        except (ValueError, TypeError):
+            return [(self.course_id, self.target_date)]
+
 class Club(Base):
     __tablename__ = "clubs"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
     slug: Mapped[str] = mapped_column(String(128), unique=True, index=True)
     country: Mapped[str] = mapped_column(String(64), default="UK")
+    login_layout: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON: learned login form, see engine.login
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     __table_args__ = (UniqueConstraint("slug", name="uq_club_slug"),)
 
+class SavedSession(Base):
+    __tablename__ = "member_sessions"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)  # HMAC(SECRET_KEY, club|username|password), see MemberSession.key_hash
+    cookies_enc: Mapped[bytes] = mapped_column(LargeBinary)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobEvent(Base):
+    __tablename__ = "job_events"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[int] = mapped_column(Integer, index=True)  # no FK: events may outlive a deleted job until compaction
+    ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_ts: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # latest repeat, see count
+    phase: Mapped[str] = mapped_column(String(24))
+    slot: Mapped[str | None] = mapped_column(String(5), nullable=True)  # HH:MM
+    latency_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    message: Mapped[str] = mapped_column(Text, default="")
+    count: Mapped[int] = mapped_column(Integer, default=1)  # consecutive identical events folded into one row
+
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
 def init_db():
     Base.metadata.create_all(engine)
+    _add_missing_columns()
+
+def _add_missing_columns():
+    # create_all() never alters existing tables; add new nullable columns in place
+    insp = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name): continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in have]
+            for col in missing:
+                ddl = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(col.name)} {ddl}"))
+            if missing:
+                for idx in table.indexes:
+                    idx.create(bind=conn, checkfirst=True)
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import select, text, func
+from sqlalchemy.orm import Session
+from .models import engine, SessionLocal, Job
+
+# Job change notifications from the web app to the workers. On Postgres this
+# is LISTEN/NOTIFY; elsewhere (SQLite) the worker polls updated_at instead.
+
+CHANNEL = "brs_jobs"
+
+def notify_job_change(db: Session, job_id: int):
+    # call before db.commit(): NOTIFY is delivered when the transaction commits
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": CHANNEL, "payload": str(job_id)})
+
+
+class JobChangeFeed:
+    def __init__(self, poll_seconds: float, watched=lambda: ()):
+        # watched(): job ids the worker is running, checked for deletion when polling
+        self.poll_seconds = poll_seconds
+        self.watched = watched
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+        self.mode = None
+        self._conn = None
+        self._task: asyncio.Task | None = None
+        self._since: datetime | None = None
+
+    async def start(self):
+        if engine.dialect.name == "postgresql":
+            try:
+                self._listen()
+                self.mode = "listen"
+                return
+            except Exception as e:
+                print(f"[notify] LISTEN unavailable ({e}); polling instead")
+        self._since = self._max_updated_at()
+        self._task = asyncio.create_task(self._poll_loop())
+        self.mode = "poll"
+
+    def close(self):
+        if self._task: self._task.cancel()
+        if self._conn:
+            asyncio.get_running_loop().remove_reader(self._conn.fileno())
+            self._conn.close()
+            self._conn = None
+
+    async def wait(self, timeout: float) -> set[int]:
+        # changed job ids, batched; empty set on timeout
+        try:
+            ids = {await asyncio.wait_for(self.queue.get(), timeout)}
+        except asyncio.TimeoutError:
+            return set()
+        while not self.queue.empty():
+            ids.add(self.queue.get_nowait())
+        return ids
+
+    def _listen(self):
+        raw = engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        conn.set_isolation_level(0)  # autocommit, required for LISTEN
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        self._conn = conn
+        asyncio.get_running_loop().add_reader(conn.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            print(f"[notify] listener connection lost ({e}); polling instead")
+            self.close()
+            self._since = self._max_updated_at()
+            self._task = asyncio.create_task(self._poll_loop())
+            self.mode = "poll"
+            return
+        while self._conn.notifies:
+            n = self._conn.notifies.pop(0)
+            if n.payload.isdigit():
+                self.queue.put_nowait(int(n.payload))
+
+    def _max_updated_at(self) -> datetime | None:
+        db = SessionLocal()
+        try:
+            return db.scalar(select(func.max(Job.updated_at)))
+        finally:
+            db.close()
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            db = SessionLocal()
+            try:
+                q = select(Job.id, Job.updated_at)
+                if self._since: q = q.where(Job.updated_at > self._since)
+                for jid, ts in db.execute(q):
+                    self.queue.put_nowait(jid)
+                    if not self._since or ts > self._since: self._since = ts
+                # deletes leave no updated_at behind
+                watched = list(self.watched())
+                if watched:
+                    alive = set(db.scalars(select(Job.id).where(Job.id.in_(watched))))
+                    for jid in set(watched) - alive:
+                        self.queue.put_nowait(jid)
+            except Exception as e:
+                print(f"[notify] poll failed: {e}")
+            finally:
+                db.close()
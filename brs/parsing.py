@@ -0,0 +1,28 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from .config import PARSE_WORKERS
+
+# Optional process pool for HTML parsing, so a slow page never stalls the
+# event loop that every job's polling and swapping runs on. With no pool
+# configured, parse() just calls the function inline.
+
+_executor: ProcessPoolExecutor | None = None
+
+def configure(workers: int = PARSE_WORKERS):
+    # call before the event loop starts (the pool forks)
+    global _executor
+    shutdown()
+    if workers > 0:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+
+def shutdown():
+    global _executor
+    if _executor:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def parse(fn, *args):
+    # fn must be a picklable module-level function (see brs.forms)
+    if _executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
@@ -0,0 +1,158 @@
+import asyncio, json, random, time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+import httpx
+from .config import (
+    CLUB_RPS, CLUB_BURST, MIN_POLL_SECONDS, POLL_FACTOR_NEAR, POLL_FACTOR_FAR, POLL_JITTER,
+    BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS, BREAKER_THRESHOLD, BREAKER_COOLDOWN_SECONDS,
+)
+
+# Worker-wide request budget per club, and how often a sheet is worth polling.
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ClubLimiter:
+    def __init__(self, rate=CLUB_RPS, burst=CLUB_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, club_slug: str) -> TokenBucket:
+        b = self._buckets.get(club_slug)
+        if not b:
+            b = self._buckets[club_slug] = TokenBucket(self.rate, self.burst)
+        return b
+
+    async def acquire(self, club_slug: str):
+        await self.bucket(club_slug).acquire()
+
+
+def retry_after_seconds(r: httpx.Response) -> float | None:
+    v = (r.headers.get("retry-after") or "").strip()
+    if not v: return None
+    if v.isdigit(): return float(v)
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(e: Exception) -> tuple[bool, float | None]:
+    # (retryable, retry_after): 429/5xx, timeouts, connection errors and garbled JSON are
+    # the club's problem and worth backing off on; anything else is the job's problem
+    if isinstance(e, httpx.HTTPStatusError):
+        code = e.response.status_code
+        if code == 429 or code >= 500:
+            return True, retry_after_seconds(e.response)
+        return False, None
+    if isinstance(e, (httpx.TransportError, json.JSONDecodeError)):
+        return True, None
+    return False, None
+
+
+class _Health:
+    def __init__(self):
+        self.failures = 0
+        self.until = 0.0      # monotonic time before which we don't poll
+        self.open = False     # circuit open: every job on the club is paused
+        self.probing = 0.0    # half-open: one fetch is testing the water, until this monotonic deadline
+        self.prober = None    # whoever took the probe (see end_probe)
+
+
+class ClubHealth:
+    def __init__(self, base=BACKOFF_BASE_SECONDS, max_delay=BACKOFF_MAX_SECONDS,
+                 threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN_SECONDS, probe_seconds=60.0):
+        self.base = base
+        self.max_delay = max_delay
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_seconds = probe_seconds  # a probe that never reports back is given up after this
+        self._clubs: dict[str, _Health] = {}
+
+    def _get(self, club_slug: str) -> _Health:
+        h = self._clubs.get(club_slug)
+        if not h:
+            h = self._clubs[club_slug] = _Health()
+        return h
+
+    def is_open(self, club_slug: str) -> bool:
+        h = self._clubs.get(club_slug)
+        return bool(h and h.open)
+
+    def wait_time(self, club_slug: str, who=None) -> float:
+        # seconds the caller should hold off before fetching; 0 means go.
+        # who: identifies the caller if it ends up taking the half-open probe
+        h = self._get(club_slug)
+        now = time.monotonic()
+        if h.probing:
+            if now < h.probing:
+                return 1.0
+            h.probing, h.prober = 0.0, None  # the probe never reported back
+        if now < h.until:
+            return h.until - now
+        if h.open:
+            h.probing, h.prober = now + self.probe_seconds, who
+        return 0.0
+
+    def end_probe(self, club_slug: str, who=None):
+        # the caller's fetch is over, whatever happened: let someone else probe if it was ours
+        h = self._clubs.get(club_slug)
+        if h and h.probing and h.prober is who:
+            h.probing, h.prober = 0.0, None
+
+    def success(self, club_slug: str):
+        h = self._clubs.pop(club_slug, None)
+        if h and h.open:
+            print(f"[health] {club_slug}: circuit closed, polling resumed")
+
+    def failure(self, club_slug: str, retry_after: float | None = None) -> float:
+        h = self._get(club_slug)
+        h.failures += 1
+        h.probing, h.prober = 0.0, None
+        delay = jittered(min(self.max_delay, self.base * 2 ** (h.failures - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if h.failures >= self.threshold:
+            if not h.open:
+                print(f"[health] {club_slug}: circuit open after {h.failures} failures")
+            h.open = True
+            delay = max(delay, self.cooldown)
+        h.until = time.monotonic() + delay
+        return delay
+
+
+def adaptive_interval(base: float, target_date: str, now: datetime | None = None) -> float:
+    # poll faster in the last 48h before the tee date, slower when it's over a week out
+    try:
+        day = datetime.strptime(target_date, "%Y/%m/%d")
+    except (TypeError, ValueError):
+        return max(MIN_POLL_SECONDS, base)
+    hours = (day - (now or datetime.now())).total_seconds() / 3600
+    if hours <= 48:
+        factor = POLL_FACTOR_NEAR
+    elif hours > 24 * 7:
+        factor = POLL_FACTOR_FAR
+    else:
+        factor = 1.0
+    return max(MIN_POLL_SECONDS, base * factor)
+
+def jittered(seconds: float, frac=POLL_JITTER) -> float:
+    return seconds * random.uniform(1 - frac, 1 + frac)
@@ -0,0 +1,259 @@
+import asyncio, contextvars, hashlib, hmac, json, time
+from contextlib import asynccontextmanager
+import httpx
+from sqlalchemy import select
+from .config import BRS_BASE, SECRET_KEY, SESSION_IDLE_SECONDS, SESSION_LOCK_SECONDS, PERSIST_SESSIONS
+from .engine import login
+from .transport import SHARED
+from .models import SessionLocal, SavedSession, Club
+from .security import encrypt, decrypt
+
+# Authenticated BRS sessions keyed by (club_slug, member username), shared by
+# every job and web request for that member. Logins happen lazily and again
+# whenever a response shows the session has expired.
+
+# the member whose login the current task is running; its own requests must not
+# trigger a relogin (that would wait on the lock the login already holds)
+_LOGGING_IN: contextvars.ContextVar = contextvars.ContextVar("brs_logging_in", default=None)
+
+def looks_logged_out(r: httpx.Response) -> bool:
+    if r.request.url.path.endswith("/login"):
+        return False
+    if r.is_redirect and "/login" in r.headers.get("location", ""):
+        return True
+    if r.url.path.endswith("/login"):
+        return True
+    if "html" in r.headers.get("content-type", ""):
+        t = r.text
+        return 'type="password"' in t or "type='password'" in t
+    return False
+
+
+class SessionClient(httpx.AsyncClient):
+    def __init__(self, *args, member: "MemberSession" = None, relogin=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.member = member
+        self.relogin = relogin
+
+    def _label(self, request: httpx.Request) -> httpx.Request:
+        # metrics label (brs.transport): only clubs a member has logged in to, so the label set stays bounded
+        if self.member and self.member.logged_in:
+            request.extensions["brs_club"] = self.member.club_slug
+        return request
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        gen = self.member.generation if self.member else 0
+        r = await super().send(self._label(request), **kwargs)
+        if self.relogin is None or kwargs.get("stream") or _LOGGING_IN.get() is self.member or not looks_logged_out(r):
+            return r
+        await self.relogin(self.member, gen)
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in ("cookie", "content-length")]
+        retry = self.build_request(request.method, request.url, headers=headers, content=request.content)
+        return await super().send(self._label(retry), **kwargs)
+
+
+class LoginLayouts:
+    # per-club learned login form, cached in memory and in clubs.login_layout
+    def __init__(self, persist=True):
+        self.persist = persist
+        self._mem: dict[str, dict | None] = {}
+
+    def get(self, club_slug: str) -> dict | None:
+        if club_slug not in self._mem:
+            self._mem[club_slug] = self._load(club_slug) if self.persist else None
+        return self._mem[club_slug]
+
+    def put(self, club_slug: str, layout: dict):
+        self._mem[club_slug] = layout
+        self._store(club_slug, json.dumps(layout))
+
+    def invalidate(self, club_slug: str):
+        if self._mem.get(club_slug) is None and club_slug in self._mem: return
+        self._mem[club_slug] = None
+        self._store(club_slug, None)
+
+    def _load(self, club_slug: str) -> dict | None:
+        db = SessionLocal()
+        try:
+            raw = db.scalar(select(Club.login_layout).where(Club.slug == club_slug))
+            return json.loads(raw) if raw else None
+        except Exception:
+            return None
+        finally:
+            db.close()
+
+    def _store(self, club_slug: str, raw: str | None):
+        if not self.persist: return
+        db = SessionLocal()
+        try:
+            c = db.scalar(select(Club).where(Club.slug == club_slug))
+            if not c:
+                if raw is None: return
+                c = Club(name=club_slug, slug=club_slug, country="UK")
+                db.add(c)
+            c.login_layout = raw
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+
+class MemberSession:
+    def __init__(self, club_slug: str, username: str, password: str):
+        self.club_slug = club_slug
+        self.username = username
+        self.password = password
+        self.client: SessionClient | None = None
+        self.loop = None
+        self.lock: asyncio.Lock | None = None
+        self.logged_in = False
+        self.generation = 0  # bumped on every successful login
+        self.users = 0
+        self.last_used = time.time()
+
+    @property
+    def key_hash(self) -> str:
+        # keyed on the password too: saved cookies are only handed to someone who could log in anyway
+        msg = f"{self.club_slug}|{self.username}|{self.password}".encode()
+        return hmac.new(SECRET_KEY.encode(), msg, hashlib.sha256).hexdigest()
+
+
+class SessionPool:
+    def __init__(self, base=BRS_BASE, persist=PERSIST_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS,
+                 lock_seconds=SESSION_LOCK_SECONDS, transport=SHARED):
+        self.base = base
+        self.persist = persist
+        self.idle_seconds = idle_seconds
+        self.lock_seconds = lock_seconds
+        self.transport = transport
+        self.logins = 0
+        self.layouts = LoginLayouts(persist=persist)
+        self._sessions: dict[tuple, MemberSession] = {}
+        self._pruned_at = time.time()
+
+    @asynccontextmanager
+    async def session(self, club_slug: str, username: str, password: str):
+        s = await self._acquire(club_slug, username, password)
+        s.users += 1
+        try:
+            yield s.client
+        finally:
+            s.users -= 1
+            s.last_used = time.time()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def peek(self, club_slug: str, username: str) -> MemberSession | None:
+        return self._sessions.get((club_slug, username))
+
+    async def close(self):
+        for s in list(self._sessions.values()):
+            await self._close(s)
+        self._sessions.clear()
+
+    async def _acquire(self, club_slug: str, username: str, password: str) -> MemberSession:
+        self._prune()
+        key = (club_slug, username)
+        s = self._sessions.get(key)
+        if s is None or s.password != password:
+            # a different password gets a fresh session: no cookies from memory, and
+            # _load() only finds a jar saved under the same password
+            s = self._sessions[key] = MemberSession(club_slug, username, password)
+        self._bind(s)
+        async with self._locked(s):
+            if not s.logged_in and self.persist and s.generation == 0:
+                s.logged_in = self._load(s)
+            if not s.logged_in:
+                try:
+                    await self._login(s)
+                except Exception:
+                    self._sessions.pop(key, None)
+                    raise
+        s.last_used = time.time()
+        return s
+
+    def _bind(self, s: MemberSession):
+        # clients and locks belong to one event loop; carry cookies over if the loop changed
+        loop = asyncio.get_running_loop()
+        if s.loop is loop and s.client and not s.client.is_closed:
+            return
+        cookies = s.client.cookies if s.client else None
+        s.client = SessionClient(
+            base_url=self.base, timeout=httpx.Timeout(30.0, connect=15.0), cookies=cookies,
+            transport=self.transport, member=s, relogin=self._relogin,
+        )
+        s.loop, s.lock = loop, asyncio.Lock()
+
+    @asynccontextmanager
+    async def _locked(self, s: MemberSession):
+        # bounded: a login stuck upstream fails the waiting requests instead of parking them
+        await asyncio.wait_for(s.lock.acquire(), self.lock_seconds)
+        try:
+            yield
+        finally:
+            s.lock.release()
+
+    async def _login(self, s: MemberSession):
+        token = _LOGGING_IN.set(s)
+        try:
+            await login(s.client, s.club_slug, s.username, s.password, base=self.base, layouts=self.layouts)
+        finally:
+            _LOGGING_IN.reset(token)
+        self.logins += 1
+        s.logged_in = True
+        s.generation += 1
+        self._save(s)
+
+    async def _relogin(self, s: MemberSession, seen_generation: int):
+        async with self._locked(s):
+            if s.generation != seen_generation and s.logged_in:
+                return  # another request already logged back in
+            s.logged_in = False
+            s.client.cookies.clear()
+            await self._login(s)
+
+    async def _close(self, s: MemberSession):
+        if s.client and not s.client.is_closed and s.loop is asyncio.get_running_loop():
+            await s.client.aclose()
+
+    def _prune(self):
+        now = time.time()
+        if now - self._pruned_at < 60: return
+        self._pruned_at = now
+        for key, s in list(self._sessions.items()):
+            if s.users == 0 and now - s.last_used > self.idle_seconds:
+                self._sessions.pop(key, None)
+                if s.client and s.loop is asyncio.get_running_loop():
+                    asyncio.ensure_future(s.client.aclose())
+
+    def _load(self, s: MemberSession) -> bool:
+        db = SessionLocal()
+        try:
+            row = db.scalar(select(SavedSession).where(SavedSession.key_hash == s.key_hash))
+            raw = decrypt(row.cookies_enc) if row else ""
+        except Exception:
+            return False
+        finally:
+            db.close()
+        if not raw: return False
+        for c in json.loads(raw):
+            s.client.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        return True
+
+    def _save(self, s: MemberSession):
+        if not self.persist: return
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in s.client.cookies.jar]
+        db = SessionLocal()
+        try:
+            row = db.scalar(select(SavedSession).where(SavedSession.key_hash == s.key_hash))
+            if not row:
+                row = SavedSession(key_hash=s.key_hash)
+                db.add(row)
+            row.cookies_enc = encrypt(json.dumps(cookies))
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
@@ -0,0 +1,282 @@
+import asyncio, time
+from dataclasses import dataclass
+import httpx
+from .config import BRS_BASE, SHEET_GROUP_SETTLE
+from .engine import LoginRejected, fetch_sheet, seats_free, to_minutes
+from .matching import JobIndex
+from .metrics import histogram
+from .ratelimit import ClubLimiter, ClubHealth, classify_error, adaptive_interval, jittered
+
+# One poller per (club_slug, course_id, target_date), shared by every job
+# watching that sheet. Each fetch is fanned out to all subscribers.
+
+POLL_DRIFT = histogram("brs_poll_drift_seconds", "How late a sheet poll ran versus its planned time (limiter, backoff, loop lag)",
+                       ("club",), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+def session_error(e: Exception) -> bool:
+    # the borrowed member session's problem, not the sheet's: BRS refusing this member,
+    # a relogin with a changed password, or a login of that member that never finished
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in (401, 403)
+    return isinstance(e, (LoginRejected, asyncio.TimeoutError))
+
+
+@dataclass(frozen=True)
+class SlotChange:
+    time: str  # HH:MM
+    free_before: int | None  # None when the slot was not on the previous sheet
+    bookable_before: bool | None
+    free_after: int | None   # None when the slot has gone from the sheet
+    bookable_after: bool | None
+
+    @property
+    def kind(self) -> str:
+        if self.free_before is None: return "added"
+        if self.free_after is None: return "removed"
+        if self.free_after > self.free_before: return "freed"
+        if self.free_after < self.free_before: return "taken"
+        return "bookable" if self.bookable_after else "unbookable"
+
+    def __str__(self):
+        return f"{self.time} {self.kind} {self.free_before}→{self.free_after} bookable={self.bookable_after}"
+
+
+class SheetState:
+    # last seen (free seats, bookable) per slot; update() returns what moved
+    def __init__(self):
+        self.slots: dict[str, tuple[int, bool]] = {}
+
+    def update(self, sheet: dict) -> list[SlotChange]:
+        cur = {}
+        for hhmm, obj in ((sheet or {}).get("times") or {}).items():
+            tee = (obj or {}).get("tee_time") or {}
+            cur[hhmm] = (seats_free(tee)[0], bool(tee.get("bookable")))
+        changes = []
+        for hhmm in sorted(cur.keys() | self.slots.keys()):
+            a, b = self.slots.get(hhmm), cur.get(hhmm)
+            if a != b:
+                changes.append(SlotChange(hhmm, *(a or (None, None)), *(b or (None, None))))
+        self.slots = cur
+        return changes
+
+
+@dataclass(frozen=True)
+class SheetUpdate:
+    version: int
+    fetched_at: float
+    sheet: dict
+    changes: tuple[SlotChange, ...]
+    full: bool  # subscriber missed earlier diffs (or this is its first sheet): rescan everything
+
+
+class SheetSubscription:
+    def __init__(self, hub: "SheetHub", key: tuple, client: httpx.AsyncClient, poll_seconds: int):
+        self.hub = hub
+        self.key = key
+        self.client = client
+        self.poll_seconds = int(poll_seconds)
+        self.seen = 0
+        self.error: Exception | None = None  # set when the feed dropped this subscriber over its own client
+        self.window: tuple | None = None  # (earliest, latest, need, accept_at_least) when indexed
+
+    @property
+    def target(self) -> tuple[str, str]:
+        return self.key[1:]  # (course_id, target_date)
+
+    async def next(self, timeout: float | None = None) -> SheetUpdate | None:
+        # newest sheet not yet seen by this subscriber; None on timeout
+        return await self.hub._next(self, timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class SheetGroup:
+    # One job watching several (course_id, target_date) sheets on one client.
+    # next() waits for the first sheet to move, then gives the others `settle`
+    # seconds to report the same poll round, so a slot that frees up on two
+    # sheets at once is seen on both and the job can pick the preferred one.
+    def __init__(self, subs: list[SheetSubscription], settle: float = SHEET_GROUP_SETTLE):
+        self.subs = subs
+        self.settle = settle
+
+    async def next(self, timeout: float | None = None) -> list[tuple[tuple[str, str], SheetUpdate]]:
+        # [(target, update)] in preference (subscription) order; [] on timeout
+        waits = {asyncio.ensure_future(s.next(timeout)): s for s in self.subs}
+        try:
+            await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in waits: t.cancel()
+            # a cancel can lose to an update that already woke the waiter; keep those too
+            await asyncio.wait(waits)
+        got = {waits[t]: t.result() for t in waits if not t.cancelled()}
+        rest = [s for s in self.subs if not got.get(s)]
+        if rest and any(got.values()):
+            got.update(zip(rest, await asyncio.gather(*(s.next(self.settle) for s in rest))))
+        return [(s.target, got[s]) for s in self.subs if got.get(s)]
+
+    def close(self):
+        for s in self.subs:
+            s.close()
+
+
+class _Feed:
+    def __init__(self, key: tuple):
+        self.key = key
+        self.subs: list[SheetSubscription] = []
+        self.version = 0
+        self.sheet: dict | None = None
+        self.state = SheetState()
+        self.changes: tuple[SlotChange, ...] = ()
+        self.index = JobIndex()
+        self.matches: dict[SheetSubscription, tuple[SlotChange, ...]] = {}
+        self.error: Exception | None = None
+        self.fetched_at = 0.0
+        self.event = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class SheetHub:
+    def __init__(self, base=BRS_BASE, limiter: ClubLimiter | None = None, health: ClubHealth | None = None):
+        self.base = base
+        self.limiter = limiter
+        self.health = health or ClubHealth()
+        self._feeds: dict[tuple, _Feed] = {}
+        self._listeners = []
+
+    def subscribe(self, client: httpx.AsyncClient, club_slug: str, course_id: str, target_date: str, poll_seconds=20, window=None) -> SheetSubscription:
+        # window: (earliest, latest, required_seats, accept_at_least); when given, the
+        # subscriber's updates only carry changes that fall inside it
+        key = (club_slug, str(course_id), target_date)
+        feed = self._feeds.get(key)
+        if not feed:
+            feed = self._feeds[key] = _Feed(key)
+        sub = SheetSubscription(self, key, client, poll_seconds)
+        if window:
+            sub.window = tuple(window)
+            feed.index.add(sub, *window)
+        feed.subs.append(sub)
+        if not feed.task or feed.task.done():
+            feed.task = asyncio.create_task(self._run(feed))
+        return sub
+
+    def subscribe_group(self, client: httpx.AsyncClient, club_slug: str, targets, poll_seconds=20, window=None) -> SheetGroup:
+        # targets: [(course_id, target_date)] most preferred first; the feeds start
+        # together, so their first fetches go out concurrently on the one client
+        return SheetGroup([self.subscribe(client, club_slug, c, d, poll_seconds=poll_seconds, window=window)
+                           for c, d in targets])
+
+    def unsubscribe(self, sub: SheetSubscription):
+        feed = self._feeds.get(sub.key)
+        if not feed or sub not in feed.subs: return
+        feed.subs.remove(sub)
+        feed.index.remove(sub)
+        if not feed.subs:
+            self._feeds.pop(sub.key, None)
+            if feed.task: feed.task.cancel()
+
+    def on_changes(self, callback):
+        # callback(key, changes) after every fetch that moved at least one slot
+        self._listeners.append(callback)
+
+    def stats(self) -> dict:
+        return {"feeds": len(self._feeds), "subscribers": sum(len(f.subs) for f in self._feeds.values())}
+
+    async def _next(self, sub: SheetSubscription, timeout: float | None):
+        if sub.error: raise sub.error
+        feed = self._feeds.get(sub.key)
+        if not feed: raise RuntimeError("Subscription is closed")
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while feed.version <= sub.seen:
+            # woken without a new version: another subscriber was dropped
+            try:
+                await asyncio.wait_for(feed.event.wait(), None if deadline is None else max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return None
+            if sub.error: raise sub.error
+        full = sub.seen != feed.version - 1
+        sub.seen = feed.version
+        if feed.error: raise feed.error
+        changes = feed.matches.get(sub, ()) if sub.window else feed.changes
+        return SheetUpdate(feed.version, feed.fetched_at, feed.sheet, changes, full)
+
+    def _publish(self, feed: _Feed, sheet: dict | None, error: Exception | None):
+        feed.sheet, feed.error = sheet, error
+        feed.changes = tuple(feed.state.update(sheet)) if sheet is not None else ()
+        feed.matches = self._match(feed)
+        feed.fetched_at = time.time()
+        feed.version += 1
+        self._wake(feed)
+        if feed.changes:
+            for cb in self._listeners:
+                try: cb(feed.key, feed.changes)
+                except Exception as e: print(f"[sheets] listener error: {e}")
+
+    def _wake(self, feed: _Feed):
+        ev, feed.event = feed.event, asyncio.Event()
+        ev.set()
+
+    def _drop(self, feed: _Feed, sub: SheetSubscription, error: Exception):
+        # fail one subscriber whose client broke; the feed carries on with the others
+        sub.error = error
+        self.unsubscribe(sub)
+        self._wake(feed)
+
+    def _match(self, feed: _Feed) -> dict:
+        # route each slot that now has free seats to the indexed subscribers that want it
+        matches: dict[SheetSubscription, list] = {}
+        if not len(feed.index): return matches
+        for c in feed.changes:
+            if not c.free_after: continue
+            for sub in feed.index.query(to_minutes(c.time), c.free_after):
+                matches.setdefault(sub, []).append(c)
+        return {sub: tuple(cs) for sub, cs in matches.items()}
+
+    async def _run(self, feed: _Feed):
+        club_slug, course_id, target_date = feed.key
+        loop = asyncio.get_running_loop()
+        due = None  # when this poll was planned to happen
+        while feed.subs:
+            wait = self.health.wait_time(club_slug, feed)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            # from here to the end of the fetch this feed may hold the club's half-open probe;
+            # a 4xx, a departed subscriber or a cancel must not leave it taken
+            try:
+                if self.limiter:
+                    await self.limiter.acquire(club_slug)
+                    if not feed.subs: break
+                sub = feed.subs[0]
+                if due is not None:
+                    POLL_DRIFT.observe(max(0.0, loop.time() - due), club=club_slug)
+                    due = None
+                try:
+                    sheet = await fetch_sheet(sub.client, club_slug, course_id, target_date, base=self.base)
+                except Exception as e:
+                    # the borrowed client went away with its job; retry on another subscriber's
+                    if sub not in feed.subs: continue
+                    retryable, retry_after = classify_error(e)
+                    if retryable:
+                        # club trouble: back off every feed on the club, keep the jobs waiting
+                        delay = self.health.failure(club_slug, retry_after)
+                        reason = f"HTTP {e.response.status_code}" if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+                        print(f"[sheets] {'/'.join(feed.key)}: {reason}; backing off {delay:.1f}s")
+                        continue
+                    if session_error(e):
+                        # one member's account or login went bad: fail that job, fetch on another's client
+                        print(f"[sheets] {'/'.join(feed.key)}: {type(e).__name__} on a subscriber's session; dropping it")
+                        self._drop(feed, sub, e)
+                        continue
+                    self._publish(feed, None, e)
+                else:
+                    self.health.success(club_slug)
+                    self._publish(feed, sheet, None)
+            finally:
+                self.health.end_probe(club_slug, feed)
+            if not feed.subs: break
+            base = min(s.poll_seconds for s in feed.subs)
+            interval = jittered(adaptive_interval(base, target_date))
+            due = loop.time() + interval
+            await asyncio.sleep(interval)
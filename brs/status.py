@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import update
+from .models import SessionLocal, Job
+from .leases import CLAIMABLE_STATUSES
+from .config import STATUS_FLUSH_SECONDS, STATUS_RETRY_MAX_SECONDS
+
+# Job status transitions from the worker, written by one task in batched
+# transactions so a running job never holds a DB connection. Every write is
+# conditional on this worker still owning the job.
+
+class StatusWriter:
+    def __init__(self, worker_id: str, flush_seconds=STATUS_FLUSH_SECONDS, retry_max=STATUS_RETRY_MAX_SECONDS):
+        self.worker_id = worker_id
+        self.flush_seconds = flush_seconds
+        self.retry_max = retry_max
+        self._ops: list[tuple[str, int, dict]] = []
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+    def pending(self) -> set[int]:
+        # jobs with unwritten transitions; not to be re-claimed until they land
+        return {jid for _, jid, _ in self._ops}
+
+    def running(self, job_id: int):
+        self._ops.append(("running", job_id, {"status": "running"}))
+        self._wake.set()
+
+    def finish(self, job_id: int, status: str, last_log: str):
+        self._ops.append(("finish", job_id, {
+            "status": status, "finished_at": datetime.utcnow(), "last_log": last_log,
+            "owner_id": None, "lease_expires_at": None,
+        }))
+        self._wake.set()
+
+    def traces(self, job_id: int, data: str):
+        # swap attempt traces (JSON); not a user-visible change, so updated_at stays
+        self._ops.append(("traces", job_id, {"traces": data, "updated_at": Job.updated_at}))
+        self._wake.set()
+
+    def release(self, job_id: int):
+        # hand the job back without touching status or updated_at
+        self._ops.append(("release", job_id, {"owner_id": None, "lease_expires_at": None, "updated_at": Job.updated_at}))
+        self._wake.set()
+
+    def flush(self) -> bool:
+        # True once everything queued so far is written
+        ops = self._ops
+        if not ops: return True
+        db = SessionLocal()
+        try:
+            for kind, jid, values in ops:
+                q = update(Job).where(Job.id == jid, Job.owner_id == self.worker_id)
+                if kind == "running":
+                    q = q.where(Job.status.in_(CLAIMABLE_STATUSES))  # don't undo a stop that raced the start
+                db.execute(q.values(**values))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[status] write of {len(ops)} transitions failed: {e}; will retry")
+            return False
+        finally:
+            db.close()
+        del self._ops[:len(ops)]
+        return True
+
+    async def _run(self):
+        delay = self.flush_seconds
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(delay)  # let transitions from other jobs pile into this batch
+            self._wake.clear()
+            if self.flush():
+                delay = self.flush_seconds
+            else:
+                # don't wait for the next transition to retry: keep at it, backing off, until the batch lands
+                delay = min(max(delay * 2, 1.0), self.retry_max)
+                self._wake.set()
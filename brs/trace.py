@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Lightweight per-attempt timing traces. A swap attempt opens a Trace; the
+# engine wraps each upstream step in span(); when the attempt ends the trace
+# goes to every sink: process-wide ones (metrics) plus any the running job
+# task registered with use_sink() (persisted with the job). Spans outside an
+# attempt are no-ops, so library calls can be traced unconditionally.
+
+GLOBAL_SINKS: list = []
+_current: ContextVar["Trace | None"] = ContextVar("brs_trace", default=None)
+_sinks: ContextVar[tuple] = ContextVar("brs_trace_sinks", default=())
+
+
+class Trace:
+    __slots__ = ("name", "attrs", "t0", "wall", "spans", "ms")
+
+    def __init__(self, name: str, **attrs):
+        self.name, self.attrs = name, attrs
+        self.t0 = time.monotonic()
+        self.wall = time.time()
+        self.spans: list[dict] = []
+        self.ms: float | None = None
+
+    def add(self, name: str, start: float, end: float, **attrs):
+        self.spans.append({"name": name, "at_ms": round((start - self.t0) * 1000, 1),
+                           "ms": round((end - start) * 1000, 1), **attrs})
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "at": self.wall, "ms": self.ms, **self.attrs, "spans": self.spans}
+
+
+def use_sink(fn):
+    # add a sink for the current task (and tasks it spawns)
+    _sinks.set(_sinks.get() + (fn,))
+
+def current() -> Trace | None:
+    return _current.get()
+
+def note(**attrs):
+    # set attributes (e.g. outcome) on the running attempt
+    tr = _current.get()
+    if tr: tr.attrs.update(attrs)
+
+def record(name: str, seconds: float, **attrs):
+    # a span measured elsewhere (e.g. detect: sheet fetch -> candidate), ending now
+    tr = _current.get()
+    if tr:
+        end = time.monotonic()
+        tr.add(name, end - seconds, end, **attrs)
+
+@contextmanager
+def span(name: str, **attrs):
+    tr = _current.get()
+    if tr is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        tr.add(name, start, time.monotonic(), **attrs)
+
+@contextmanager
+def attempt(name: str, **attrs):
+    tr = Trace(name, **attrs)
+    token = _current.set(tr)
+    try:
+        yield tr
+    except BaseException as e:
+        tr.attrs.setdefault("outcome", "error")
+        tr.attrs["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current.reset(token)
+        tr.ms = round((time.monotonic() - tr.t0) * 1000, 1)
+        for sink in (*GLOBAL_SINKS, *_sinks.get()):
+            try:
+                sink(tr)
+            except Exception as e:
+                print(f"[trace] sink failed: {e}")
@@ -0,0 +1,91 @@
+import asyncio, time, weakref
+import httpx
+from .metrics import UPSTREAM_REQUESTS, UPSTREAM_LATENCY
+from .config import HTTP2, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_SECONDS, HTTP_PER_HOST
+
+# One connection pool for the whole process. Every client (one per member
+# session, so cookies stay separate) sends through it, so thousands of jobs
+# share a handful of keep-alive / HTTP/2 connections to BRS.
+
+try:
+    import h2  # noqa: F401  (httpx only enables HTTP/2 when h2 is installed)
+    HAVE_H2 = True
+except ImportError:
+    HAVE_H2 = False
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release:
+                self._release()
+                self._release = None
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, http2=HTTP2, max_connections=HTTP_MAX_CONNECTIONS, max_keepalive=HTTP_MAX_KEEPALIVE,
+                 keepalive_seconds=HTTP_KEEPALIVE_SECONDS, per_host=HTTP_PER_HOST):
+        self.http2 = http2 and HAVE_H2
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_seconds)
+        self.per_host = per_host
+        # pools and semaphores are bound to an event loop
+        self._pools: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._hosts: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _pool(self, loop) -> httpx.AsyncHTTPTransport:
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+        return pool
+
+    def _host_sem(self, loop, host: str) -> asyncio.Semaphore:
+        sems = self._hosts.setdefault(loop, {})
+        sem = sems.get(host)
+        if sem is None:
+            sem = sems[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # per-host cap on in-flight requests; the slot is held until the body is closed
+        loop = asyncio.get_running_loop()
+        sem = self._host_sem(loop, request.url.host)
+        await sem.acquire()
+        # set by callers that know the club is real (see SessionClient); never taken from the URL,
+        # which for slug probes is whatever users typed into club search
+        club = request.extensions.get("brs_club", "")
+        t = time.perf_counter()
+        try:
+            resp = await self._pool(loop).handle_async_request(request)
+        except BaseException as e:
+            sem.release()
+            UPSTREAM_REQUESTS.inc(club=club, method=request.method, status=type(e).__name__)
+            raise
+        UPSTREAM_LATENCY.observe(time.perf_counter() - t, club=club, method=request.method)
+        UPSTREAM_REQUESTS.inc(club=club, method=request.method, status=f"{resp.status_code // 100}xx")
+        resp.stream = _ReleasingStream(resp.stream, sem.release)
+        return resp
+
+    async def aclose(self):
+        pass  # clients come and go; the shared pool stays up
+
+    async def close_all(self):
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool:
+            await pool.aclose()
+
+
+SHARED = SharedTransport()
+
+def new_client(**kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=SHARED, **kwargs)
@@ -1,3 +1,33 @@
-import time
+import time, asyncio
 def now_utc_ts() -> float:
     return time.time()
+
+class LoopLagMonitor:
+    # how late the event loop wakes a sleeping task; sustained lag means something
+    # (usually parsing) is hogging the loop
+    def __init__(self, interval=0.25, window=240):
+        self.interval = interval
+        self.window = window
+        self.samples: list[float] = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def stop(self):
+        if self._task: self._task.cancel()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - t - self.interval))
+            del self.samples[:-self.window]
+
+    def snapshot(self) -> dict:
+        s = sorted(self.samples)
+        if not s: return {"n": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        pick = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1000
+        return {"n": len(s), "p50_ms": round(pick(0.5), 1), "p99_ms": round(pick(0.99), 1), "max_ms": round(s[-1] * 1000, 1)}
@@ -0,0 +1,95 @@
+import asyncio, os, sys, time, unittest
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brs.ratelimit import ClubHealth
+from brs.sheets import SheetHub
+
+# Circuit breaker half-open probe: whatever happens to the probing fetch, the
+# club must not stay paused. Run with: python -m unittest discover tests
+
+SHEET = {"times": {"08:00": {"tee_time": {"slots": 4, "players": []}}}}
+
+
+def open_breaker() -> ClubHealth:
+    health = ClubHealth(base=0.01, max_delay=0.05, threshold=1, cooldown=0.05)
+    health.failure("club")
+    time.sleep(0.06)  # cooldown over: the next fetch is the probe
+    return health
+
+
+class ProbeTest(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 10))
+
+    def test_probe_rejected_with_4xx_releases_the_club(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            if len(calls) == 1:
+                return httpx.Response(403)
+            return httpx.Response(200, json=SHEET)
+
+        async def scenario():
+            health = open_breaker()
+            hub = SheetHub(base="http://brs.test", health=health)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                sub = hub.subscribe(client, "club", "1", "2030/01/01")
+                # not assertRaises: it clears the traceback's frames, which would finalize the feed task
+                try:
+                    await sub.next(timeout=2)
+                    self.fail("the 403 should reach the subscriber")
+                except httpx.HTTPStatusError:
+                    pass
+                sub.close()
+                self.assertFalse(health._get("club").probing)
+                # upstream is fine again: a new feed on the club must get to fetch
+                sub = hub.subscribe(client, "club", "2", "2030/01/01")
+                upd = await sub.next(timeout=2)
+                sub.close()
+            return upd
+
+        upd = self.run_async(scenario())
+        self.assertIsNotNone(upd)
+        self.assertEqual(len(calls), 2)
+
+    def test_probe_cancelled_mid_fetch_releases_the_club(self):
+        async def scenario():
+            fetching = asyncio.Event()
+
+            async def handler(request):
+                fetching.set()
+                await asyncio.sleep(30)
+                return httpx.Response(200, json=SHEET)
+
+            health = open_breaker()
+            hub = SheetHub(base="http://brs.test", health=health)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                sub = hub.subscribe(client, "club", "1", "2030/01/01")
+                await fetching.wait()
+                self.assertTrue(health._get("club").probing)
+                feed_task = hub._feeds[sub.key].task
+                sub.close()  # last subscriber gone: the feed task is cancelled mid-probe
+                await asyncio.gather(feed_task, return_exceptions=True)
+            return health
+
+        health = self.run_async(scenario())
+        self.assertFalse(health._get("club").probing)
+        self.assertEqual(health.wait_time("club"), 0.0)
+
+    def test_abandoned_probe_expires(self):
+        health = ClubHealth(base=0.01, max_delay=0.05, threshold=1, cooldown=0.05, probe_seconds=0.05)
+        health.failure("club")
+        time.sleep(0.06)
+        self.assertEqual(health.wait_time("club", "a"), 0.0)  # "a" takes the probe and never reports back
+        self.assertEqual(health.wait_time("club", "b"), 1.0)
+        time.sleep(0.06)
+        self.assertEqual(health.wait_time("club", "b"), 0.0)
+        health.end_probe("club", "a")  # late report from the old prober leaves b's probe alone
+        self.assertTrue(health._get("club").probing)
+
+
+if __name__ == "__main__":
+    unittest.main()
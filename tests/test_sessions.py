@@ -0,0 +1,91 @@
+import asyncio, os, sys, unittest
+from urllib.parse import parse_qs
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brs.engine import LoginRejected, fetch_sheet
+from brs.sessions import SessionPool
+
+# Logins run through the member's own SessionClient: the relogin hook must not
+# fire on them. Run with: python -m unittest discover tests
+
+LOGIN_PAGE = """<html><body><form name="login_form" method="post" action="/club/login_check">
+<input type="hidden" name="login_form[_token]" value="t">
+<input type="text" name="login_form[username]">
+<input type="password" name="login_form[password]">
+</form></body></html>"""
+
+SHEET = {"times": {}}
+
+
+class FakeBRS:
+    # the login form posts to /club/login_check, so a refused login lands on a page
+    # that is not /login but still has a password input
+    def __init__(self):
+        self.logins = 0
+        self.session = None
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/club/login":
+            return httpx.Response(200, html=LOGIN_PAGE)
+        if path == "/club/login_check":
+            form = parse_qs(request.content.decode())
+            if form.get("login_form[password]") != ["right"]:
+                return httpx.Response(200, html=LOGIN_PAGE)
+            self.logins += 1
+            self.session = f"s{self.logins}"
+            return httpx.Response(302, headers={"location": "/club/home", "set-cookie": f"sid={self.session}; Path=/"})
+        if path == "/club/home":
+            return httpx.Response(200, html="<html><body>Welcome</body></html>")
+        if request.headers.get("cookie") != f"sid={self.session}":
+            return httpx.Response(302, headers={"location": "/club/login"})
+        return httpx.Response(200, json=SHEET)
+
+
+class SessionTest(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 10))
+
+    def pool(self, brs: FakeBRS) -> SessionPool:
+        return SessionPool(base="http://brs.test", persist=False, lock_seconds=2, transport=httpx.MockTransport(brs.handler))
+
+    def test_wrong_password_is_refused_not_retried(self):
+        brs = FakeBRS()
+
+        async def scenario():
+            pool = self.pool(brs)
+            try:
+                async with pool.session("club", "u", "wrong"):
+                    pass
+            except LoginRejected:
+                return pool
+            finally:
+                await pool.close()
+            self.fail("the wrong password should be refused")
+
+        pool = self.run_async(scenario())
+        self.assertEqual(pool.logins, 0)
+        self.assertIsNone(pool.peek("club", "u"))
+
+    def test_expired_session_logs_back_in(self):
+        brs = FakeBRS()
+
+        async def scenario():
+            pool = self.pool(brs)
+            try:
+                async with pool.session("club", "u", "right") as client:
+                    brs.session = "expired"  # upstream drops the session
+                    sheet = await fetch_sheet(client, "club", "1", "2030/01/01", base="http://brs.test")
+            finally:
+                await pool.close()
+            return pool, sheet
+
+        pool, sheet = self.run_async(scenario())
+        self.assertEqual(sheet, SHEET)
+        self.assertEqual(pool.logins, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import asyncio, os, sys, unittest
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brs.sheets import SheetHub
+
+# A shared sheet feed fetches with one subscriber's client at a time: an error
+# tied to that member's session must stay with that subscriber.
+# Run with: python -m unittest discover tests
+
+SHEET = {"times": {"08:00": {"tee_time": {"slots": 4, "players": []}}}}
+
+
+class SharedFeedTest(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 10))
+
+    def test_one_members_403_does_not_fail_the_others(self):
+        async def scenario():
+            hub = SheetHub(base="http://brs.test")
+            refused = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(403)))
+            healthy = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json=SHEET)))
+            async with refused, healthy:
+                sa = hub.subscribe(refused, "club", "1", "2030/01/01")
+                sb = hub.subscribe(healthy, "club", "1", "2030/01/01")
+                upd = await sb.next(timeout=2)
+                # not assertRaises: it clears the traceback's frames, which would finalize the feed task
+                try:
+                    await sa.next(timeout=2)
+                    error = None
+                except httpx.HTTPStatusError as e:
+                    error = e
+                stats = hub.stats()
+                sa.close()
+                sb.close()
+            return upd, error, stats
+
+        upd, error, stats = self.run_async(scenario())
+        self.assertIsNotNone(upd)
+        self.assertEqual(upd.sheet, SHEET)
+        self.assertEqual(error.response.status_code, 403)
+        self.assertEqual(stats, {"feeds": 1, "subscribers": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,25 @@
-import os, re, asyncio, httpx
+import os, re, json, time, asyncio
+from datetime import datetime
 from pathlib import Path
-from flask import Flask, request, redirect, url_for, session, render_template, abort, jsonify
-from sqlalchemy import select, or_
-from brs.models import init_db, SessionLocal, User, Job, Club
+from flask import Flask, Response, g, request, redirect, url_for, session, render_template, abort, jsonify
+from sqlalchemy import select, and_, or_
+from brs.models import init_db, SessionLocal, User, Job
 from brs.security import hash_password, verify_password, encrypt
-from brs.config import SECRET_KEY
-from brs.engine import login as brs_login
-from bs4 import BeautifulSoup
+from brs.config import (SECRET_KEY, BRS_BASE, CATALOG_REFRESH_SECONDS,
+                        MEMBER_CACHE_TTL, AUTOCOMPLETE_URL_TTL, AUTOCOMPLETE_CAP,
+                        WEB_ASYNC_LIMIT, WEB_QUEUE_SECONDS, WEB_REQUEST_TIMEOUT,
+                        JOBS_PAGE_SIZE, JOBS_POLL_SECONDS, METRICS_TOKEN,
+                        MAX_JOB_TARGETS)
+from brs.aio import LoopThread, LoopBusy
+from brs import metrics
+from brs.engine import DEFAULT_UA, CANDIDATE_ORDERS
+from brs.forms import find_autocomplete_url
+from brs.parsing import parse
+from brs.sessions import SessionPool
+from brs.notify import notify_job_change
+from brs.events import tail as tail_events
+from brs.clubs import ClubCatalog, SlugProber, norm
+from brs.members import MemberCache
 
 # --- Directories (point Flask one level up from /web) ---
 BASE_DIR = Path(__file__).resolve().parent       # /web
@@ -25,6 +38,52 @@ app = Flask(
 app.secret_key = SECRET_KEY
 init_db()
 
+# async views run on one process-wide loop instead of a fresh loop per request,
+# so the threads of a gthread worker share HTTP pools, BRS sessions and caches
+LOOP = LoopThread(WEB_ASYNC_LIMIT, WEB_QUEUE_SECONDS)
+app.async_to_sync = lambda func: lambda *a, **kw: LOOP.run(func(*a, **kw), WEB_REQUEST_TIMEOUT)
+
+# === Metrics ===
+WEB_REQUESTS = metrics.counter("brs_web_requests_total", "Web requests by endpoint and status", ("endpoint", "status"))
+WEB_LATENCY = metrics.histogram("brs_web_request_seconds", "Web request latency by endpoint", ("endpoint",))
+metrics.gauge("brs_web_async_in_flight", "Async views running on the shared loop", fn=lambda: LOOP.in_flight)
+metrics.gauge("brs_web_member_sessions", "Pooled BRS member sessions", fn=lambda: len(SESSIONS))
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _record(resp):
+    ep = request.endpoint or "unmatched"
+    WEB_LATENCY.observe(time.perf_counter() - g.get("t0", time.perf_counter()), endpoint=ep)
+    WEB_REQUESTS.inc(endpoint=ep, status=resp.status_code)
+    return resp
+
+@app.get("/metrics")
+def metrics_page():
+    # public service: off unless a scrape token is configured
+    if not METRICS_TOKEN:
+        abort(404)
+    if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(LoopBusy)
+def busy(e):
+    return jsonify({"results": [], "error": "busy, try again"}), 503
+
+@app.errorhandler(TimeoutError)
+def upstream_timeout(e):
+    return jsonify({"results": [], "error": "timed out"}), 504
+
+BASE = BRS_BASE
+UA = DEFAULT_UA
+SESSIONS = SessionPool()  # logged-in BRS sessions reused across player searches
+CATALOG = ClubCatalog(refresh_seconds=CATALOG_REFRESH_SECONDS)  # club autocomplete index
+PROBER = SlugProber(CATALOG, BASE)  # live slug discovery with hit/miss cache
+MEMBERS = MemberCache(MEMBER_CACHE_TTL, AUTOCOMPLETE_URL_TTL, AUTOCOMPLETE_CAP)  # player search caches
+
 # === Dashboard page (kept as your original PAGE string) ===
 PAGE = """
 <!doctype html>
@@ -117,6 +176,22 @@ PAGE = """
         <label class="flex">
           <input type="checkbox" name="accept_at_least" checked> Accept at least N seats
         </label>
+
+        <label>
+          Also watch (optional, in order of preference)
+          <input name="also_watch" placeholder="2025/09/06, 2 2025/09/05">
+          <span class="small">Other dates, courses, or "course date"; the booked course and date come first</span>
+        </label>
+        <label>
+          Prefer
+          <select name="prefer">
+            <option value="">Default</option>
+            <option value="earliest">Earliest time</option>
+            <option value="closest">Closest to…</option>
+            <option value="fewest">Fewest other players</option>
+          </select>
+          <input name="prefer_time" placeholder="HH:MM (for closest)">
+        </label>
       </div>
 
       <hr>
@@ -142,21 +217,24 @@ PAGE = """
       <thead><tr><th>ID</th><th>Club</th><th>Date</th><th>Window</th><th>Current</th><th>Status</th><th>Actions</th></tr></thead>
       <tbody>
       {% for j in jobs %}
-        <tr>
+        <tr data-job="{{j.id}}">
           <td>{{j.id}}</td>
           <td>{{j.club_slug}}/{{j.course_id}}</td>
-          <td>{{j.target_date}}</td>
+          <td>{{j.target_date}}{% if j.targets %} <span class="small" title="{% for c, d in j.target_list() %}{{c}} {{d}}&#10;{% endfor %}">+{{ j.target_list()|length - 1 }}</span>{% endif %}</td>
           <td>{{j.earliest}}–{{j.latest}}</td>
           <td>{{j.current_time}}</td>
-          <td>{{j.status}}</td>
+          <td class="st">{{j.status}}</td>
           <td>
-            <a href="{{url_for('toggle_job', job_id=j.id)}}">{{'Stop' if j.status=='active' else 'Start'}}</a> |
-            <a href="{{url_for('delete_job', job_id=j.id)}}" onclick="return confirm('Delete job?')">Delete</a>
+            <a class="tg" href="{{url_for('toggle_job', job_id=j.id)}}">{{'Stop' if j.status in ('active', 'running') else 'Start'}}</a> |
+            <a href="{{url_for('delete_job', job_id=j.id)}}" onclick="return confirm('Delete job?')">Delete</a> |
+            <a href="{{url_for('api_job_events', job_id=j.id)}}">Log</a> |
+            <a href="{{url_for('job_traces', job_id=j.id)}}">Traces</a>
           </td>
         </tr>
       {% endfor %}
       </tbody>
     </table>
+    {% if older %}<p><a href="{{url_for('home', before=older)}}">Older jobs →</a></p>{% endif %}
   </section>
   {% endif %}
 </main>
@@ -264,10 +342,78 @@ PAGE = """
   document.getElementById('jobform')?.addEventListener('submit', ()=>{
     sessionStorage.removeItem('sel_players');
   });
+
+  // Live job status: poll for jobs changed since the last cursor (short requests, no thread held open)
+  if(document.querySelector('tr[data-job]')){
+    let cursor = {{ since|tojson }};
+    const poll = async ()=>{
+      let more = false;
+      if(!document.hidden){
+        try{
+          const r = await fetch('/api/jobs?limit=200&cursor=' + encodeURIComponent(cursor));
+          if(r.ok){
+            const d = await r.json();
+            cursor = d.cursor || cursor; more = d.more;
+            d.jobs.forEach(j=>{
+              const row = document.querySelector(`tr[data-job="${j.id}"]`);
+              if(!row) return;
+              row.querySelector('.st').textContent = j.status;
+              row.querySelector('.tg').textContent = ['active','running'].includes(j.status) ? 'Stop' : 'Start';
+            });
+          }
+        }catch(e){}
+      }
+      setTimeout(poll, more ? 0 : {{ poll_ms }});
+    };
+    setTimeout(poll, {{ poll_ms }});
+  }
 })();
 </script>
 """
 
+# === Swap attempt timings for one job ===
+TRACES_PAGE = """
+<!doctype html>
+<title>BRS Bot — job {{job.id}} traces</title>
+<link rel="stylesheet" href="https://unpkg.com/mvp.css">
+<style>
+.bar { background:#118bee; height:.8rem; border-radius:3px; min-width:1px; }
+.small { font-size:.9rem; color:#555; }
+td, th { padding:.2rem .5rem; }
+</style>
+<main>
+  <header>
+    <h1>Job {{job.id}} — swap attempts</h1>
+    <p><a href="{{url_for('home')}}">← Back</a> · {{job.club_slug}}/{{job.course_id}} {{job.target_date}} {{job.earliest}}–{{job.latest}} · {{job.status}}</p>
+  </header>
+  {% for t in traces %}
+  <section>
+    <h3>{{t.slot}}{% if t.rank and t.rank > 1 %} (fallback #{{t.rank}}){% endif %} · {{t.outcome or '?'}} · {{t.ms}} ms</h3>
+    <p class="small">{{t.at_text}}{% if t.sheet %} · course/date {{t.sheet}}{% endif %} · {{t.mode}}{% if t.error %} · {{t.error}}{% endif %}</p>
+    <table>
+      <thead><tr><th>Step</th><th>Start</th><th>ms</th><th style="width:50%"></th></tr></thead>
+      <tbody>
+      {% for sp in t.spans %}
+        <tr>
+          <td>{{sp.name}}{% if sp.attempt %} #{{sp.attempt}}{% endif %}{% if sp.error %} ({{sp.error}}){% endif %}</td>
+          <td>{{sp.at_ms}}</td>
+          <td>{{sp.ms}}</td>
+          <td><div class="bar" style="margin-left:{{ ((sp.at_ms - t.lo) / t.scale * 100) | round(1) }}%; width:{{ (sp.ms / t.scale * 100) | round(1) }}%"></div></td>
+        </tr>
+      {% endfor %}
+      </tbody>
+    </table>
+  </section>
+  {% else %}
+  <p>No swap attempts recorded yet.</p>
+  {% endfor %}
+</main>
+"""
+
+# compiled once at import rather than on every dashboard render
+DASHBOARD = app.jinja_env.from_string(PAGE)
+TRACES = app.jinja_env.from_string(TRACES_PAGE)
+
 # === Helpers ===
 def get_user():
     uid = session.get("uid")
@@ -292,15 +438,100 @@ def home():
     if not user:
         return redirect(url_for("auth"))
 
-    jobs = []
+    before = request.args.get("before", type=int)
     db = SessionLocal()
     try:
-        jobs = db.scalars(
-            select(Job).where(Job.user_id == user.id).order_by(Job.id.desc())
-        ).all()
+        q = select(Job).where(Job.user_id == user.id)
+        if before: q = q.where(Job.id < before)
+        jobs = db.scalars(q.order_by(Job.id.desc()).limit(JOBS_PAGE_SIZE + 1)).all()
     finally:
         db.close()
-    return render_template_string(PAGE, user=user, jobs=jobs)
+    older = jobs[JOBS_PAGE_SIZE - 1].id if len(jobs) > JOBS_PAGE_SIZE else None
+    since = f"{datetime.utcnow().isoformat()}|0"  # the page shows everything up to now; poll from here
+    return render_template(DASHBOARD, user=user, jobs=jobs[:JOBS_PAGE_SIZE], older=older,
+                           since=since, poll_ms=int(JOBS_POLL_SECONDS * 1000))
+
+# === Job status API (cursor-paged; the dashboard polls it) ===
+def _job_json(j: Job) -> dict:
+    return {
+        "id": j.id, "club_slug": j.club_slug, "course_id": j.course_id, "target_date": j.target_date,
+        "targets": j.target_list(), "earliest": j.earliest, "latest": j.latest, "current_time": j.current_time, "status": j.status,
+        "last_log": (j.last_log or "")[:500], "updated_at": j.updated_at.isoformat() if j.updated_at else None,
+    }
+
+def _parse_cursor(c: str | None):
+    # "<updated_at iso>|<id>"; anything unparsable means "from the start"
+    try:
+        ts, jid = (c or "").split("|")
+        return datetime.fromisoformat(ts), int(jid)
+    except ValueError:
+        return None
+
+def _changed_jobs(uid: int, cursor, limit: int) -> tuple[list[Job], str | None, bool]:
+    # jobs updated after cursor in (updated_at, id) order; returns (jobs, next cursor, more)
+    db = SessionLocal()
+    try:
+        q = select(Job).where(Job.user_id == uid)
+        if cursor:
+            ts, jid = cursor
+            q = q.where(or_(Job.updated_at > ts, and_(Job.updated_at == ts, Job.id > jid)))
+        jobs = db.scalars(q.order_by(Job.updated_at, Job.id).limit(limit + 1)).all()
+    finally:
+        db.close()
+    more = len(jobs) > limit
+    jobs = jobs[:limit]
+    nxt = f"{jobs[-1].updated_at.isoformat()}|{jobs[-1].id}" if jobs else None
+    return jobs, nxt, more
+
+@app.get("/api/jobs")
+def api_jobs():
+    uid = session.get("uid")
+    if not uid: abort(401)
+    cursor = request.args.get("cursor")
+    limit = max(1, min(request.args.get("limit", 50, type=int), 200))
+    jobs, nxt, more = _changed_jobs(uid, _parse_cursor(cursor), limit)
+    return jsonify({"jobs": [_job_json(j) for j in jobs], "cursor": nxt or cursor, "more": more})
+
+@app.get("/api/jobs/<int:job_id>/events")
+def api_job_events(job_id):
+    uid = session.get("uid")
+    if not uid: abort(401)
+    after = request.args.get("after", type=int)
+    limit = max(1, min(request.args.get("limit", 100, type=int), 500))
+    db = SessionLocal()
+    try:
+        if db.scalar(select(Job.user_id).where(Job.id == job_id)) != uid: abort(404)
+        evs = tail_events(db, job_id, after=after, limit=limit)
+    finally:
+        db.close()
+    return jsonify({
+        "events": [{
+            "id": e.id, "ts": e.ts.isoformat(), "last_ts": e.last_ts.isoformat() if e.last_ts else None,
+            "phase": e.phase, "slot": e.slot, "latency_ms": e.latency_ms, "message": e.message, "count": e.count,
+        } for e in evs],
+        "after": evs[-1].id if evs else after,
+    })
+
+@app.get("/jobs/<int:job_id>/traces")
+def job_traces(job_id):
+    uid = session.get("uid")
+    if not uid: return redirect(url_for("auth"))
+    db = SessionLocal()
+    try:
+        j = db.get(Job, job_id)
+        if not j or j.user_id != uid: abort(404)
+    finally:
+        db.close()
+    try:
+        traces = json.loads(j.traces or "[]")
+    except ValueError:
+        traces = []
+    for t in traces:
+        t["at_text"] = datetime.utcfromtimestamp(t.get("at") or 0).strftime("%Y-%m-%d %H:%M:%S UTC")
+        spans = t.get("spans", [])
+        t["lo"] = min([0, *(sp["at_ms"] for sp in spans)])  # detect starts before the attempt
+        t["scale"] = max([t.get("ms") or 0, *(sp["at_ms"] + sp["ms"] for sp in spans)]) - t["lo"] or 1
+    return render_template(TRACES, job=j, traces=list(reversed(traces)))
 
 # === Auth actions ===
 @app.post("/register")
@@ -338,6 +569,23 @@ def logout():
     return redirect(url_for("auth"))
 
 # === Job management ===
+DATE_RE = re.compile(r"^\d{4}/\d{2}/\d{2}$")
+TIME_RE = re.compile(r"^\d{2}:\d{2}$")
+
+def _parse_targets(text: str, course_id: str, target_date: str) -> str | None:
+    # "2025/09/06, 2 2025/09/05, 3" -> JSON [[course, date], …] with the booked sheet first; None if nothing extra
+    targets = [(course_id, target_date)]
+    for entry in re.split(r"[,;\n]+", text or ""):
+        c, d = course_id, target_date
+        for tok in entry.split():
+            if DATE_RE.match(tok): d = tok
+            elif tok.isalnum(): c = tok
+            else: raise ValueError(f"Can't read '{entry.strip()}' (use YYYY/MM/DD and/or a course ID)")
+        if (c, d) not in targets: targets.append((c, d))
+    if len(targets) > MAX_JOB_TARGETS:
+        raise ValueError(f"At most {MAX_JOB_TARGETS} course/date combinations per job")
+    return json.dumps(targets) if len(targets) > 1 else None
+
 @app.post("/jobs")
 def create_job():
     user = get_user()
@@ -347,6 +595,14 @@ def create_job():
     pids = [x for x in pidcsv.split(",") if x.strip()]
     if len(pids) == 0 or len(pids) > 4:
         return "Select between 1 and 4 players", 400
+    try:
+        targets = _parse_targets(f.get("also_watch", ""), f["course_id"].strip(), f["target_date"].strip())
+    except ValueError as e:
+        return str(e), 400
+    prefer = f.get("prefer") if f.get("prefer") in CANDIDATE_ORDERS else None
+    prefer_time = f.get("prefer_time", "").strip() or None
+    if prefer_time and not TIME_RE.match(prefer_time):
+        return "Preferred time must be HH:MM", 400
     db = SessionLocal()
     try:
         j = Job(
@@ -356,17 +612,22 @@ def create_job():
             member_username_enc=encrypt(f["username"].strip()),
             member_password_enc=encrypt(f["password"].strip()),
             target_date=f["target_date"].strip(),
+            targets=targets,
             earliest=f["earliest"].strip(),
             latest=f["latest"].strip(),
             current_time=f["current_time"].strip(),
             required_seats=int(f.get("required_seats","4")),
             accept_at_least=("accept_at_least" in f),
+            prefer=prefer,
+            prefer_time=prefer_time,
             poll_seconds=int(f.get("poll_seconds","20")),
             max_minutes=int(f.get("max_minutes","120")),
             player_ids_csv=pidcsv,
             status="active",
         )
-        db.add(j); db.commit()
+        db.add(j); db.flush()
+        notify_job_change(db, j.id)
+        db.commit()
     finally:
         db.close()
     return redirect(url_for("home"))
@@ -379,7 +640,8 @@ def toggle_job(job_id):
     try:
         j = db.get(Job, job_id)
         if not j or j.user_id != user.id: abort(404)
-        j.status = "stopped" if j.status == "active" else "active"
+        j.status = "stopped" if j.status in ("active", "running") else "active"
+        notify_job_change(db, j.id)
         db.commit()
     finally:
         db.close()
@@ -393,21 +655,15 @@ def delete_job(job_id):
     try:
         j = db.get(Job, job_id)
         if not j or j.user_id != user.id: abort(404)
+        notify_job_change(db, j.id)
         db.delete(j); db.commit()
     finally:
         db.close()
     return redirect(url_for("home"))
 
 # === Club resolver API (live probe + cache) ===
-def _norm(s: str) -> str:
-    s = s.lower().strip()
-    s = re.sub(r"(golf( club)?|g.c.|g&cc|g\s*&\s*c|\bgc\b)$", "", s)
-    s = re.sub(r"[^a-z0-9\s-]", "", s)
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
-
 def _slug_candidates(q: str) -> list[str]:
-    q = _norm(q)
+    q = norm(q)
     parts = q.split()
     base = ["-".join(parts), "_".join(parts), "".join(parts)]
     base += [ "-".join(p for p in parts if p not in ("golf","club")) ]
@@ -420,47 +676,20 @@ def _slug_candidates(q: str) -> list[str]:
             out.append(s); seen.add(s)
     return out
 
-async def _probe_slug(slug: str) -> bool:
-    url = f"{BASE}/{slug}/login"
-    timeout = httpx.Timeout(10.0, connect=5.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.get(url, headers={"User-Agent": UA})
-        return r.status_code in (200, 302)
-
 @app.get("/api/clubs/search")
 async def api_clubs_search():
     q = (request.args.get("q") or "").strip()
     if not q:
         return jsonify({"results": []})
-    db = SessionLocal()
-    try:
-        like = f"%{_norm(q).replace(' ', '%')}%"
-        cached = db.scalars(
-            select(Club).where(or_(Club.name.ilike(like), Club.slug.ilike(like)))
-                        .order_by(Club.name.asc())
-        ).all()
-        results = [ {"name": c.name, "slug": c.slug} for c in cached ]
-
-        cand_slugs = _slug_candidates(q)
-        discovered = []
-        for slug in cand_slugs:
-            if any(r["slug"] == slug for r in results):
-                continue
-            ok = await _probe_slug(slug)
-            if ok:
-                c = Club(name=q, slug=slug, country="UK")
-                try:
-                    db.add(c); db.commit()
-                except Exception:
-                    db.rollback()
-                discovered.append({"name": q, "slug": slug})
-        results += discovered
-        unique = {}
-        for r in results:
-            unique[r["slug"]] = r
-        return jsonify({"results": list(unique.values())[:20]})
-    finally:
-        db.close()
+    CATALOG.ensure_loaded()
+    results = CATALOG.search(q)
+
+    discovered = await PROBER.discover(q, _slug_candidates(q))
+    results += discovered
+    unique = {}
+    for r in results:
+        unique[r["slug"]] = r
+    return jsonify({"results": list(unique.values())[:20]})
 
 # === Player search API ===
 @app.post("/api/players/search")
@@ -474,35 +703,29 @@ async def api_players_search():
     if not club or not q or not username or not password:
         return jsonify({"results": []})
 
-    timeout = httpx.Timeout(30.0, connect=15.0)
-    async with httpx.AsyncClient(base_url=BASE, timeout=timeout) as client:
-        # 1) login (reuse engine login for robustness)
-        await brs_login(client, club, username, password, base=BASE)
-
-        # 2) discover autocomplete URL by opening a store page
-        ymd = (date or "2025/09/05").replace("/","")
-        autouri = None
-        for hhmm in ("0700","0730","0800","0900","0000"):
-            url = f"/{club}/bookings/store/1/{ymd}/{hhmm}"
-            r3 = await client.get(url, headers={"User-Agent": UA, "Referer": url})
-            if r3.status_code != 200:
-                continue
-            soup3 = BeautifulSoup(r3.text, "lxml")
-            txt = soup3.find("input", attrs={"name": "member_booking_form[player_1_text]"}) or \
-                  soup3.find("input", attrs={"data-autocomplete-url": True})
-            if txt and txt.get("data-autocomplete-url"):
-                autouri = txt.get("data-autocomplete-url")
-                if not autouri.startswith("/"):
-                    autouri = "/" + autouri
-                break
+    # 0) repeat searches by a member with a live session are answered from the directory cache
+    live = SESSIONS.peek(club, username)
+    if live and live.logged_in and live.password == password:
+        hit = MEMBERS.lookup(club, q)
+        if hit is not None:
+            return jsonify({"results": hit[:20]})
 
+    # 1) pooled login (only hits BRS when there is no live session for this member)
+    async with SESSIONS.session(club, username, password) as client:
+
+        # 2) autocomplete URL: cached per club, else discovered by opening a store page
+        autouri = MEMBERS.autocomplete_url(club)
         if not autouri:
-            return jsonify({"results": [], "error": "autocomplete url not found"})
+            autouri = await _discover_autocomplete_url(client, club, date)
+            if not autouri:
+                return jsonify({"results": [], "error": "autocomplete url not found"})
+            MEMBERS.set_autocomplete_url(club, autouri)
 
         # 3) query autocomplete
         params = {"q": q, "term": q}
         r = await client.get(autouri, params=params, headers={"User-Agent": UA})
         if r.status_code != 200:
+            MEMBERS.forget_autocomplete_url(club)
             return jsonify({"results": []})
         try:
             data = r.json()
@@ -515,8 +738,21 @@ async def api_players_search():
             txt = item.get("text") or item.get("label") or item.get("name")
             if pid and txt:
                 results.append({"id": int(pid), "text": txt})
+        MEMBERS.store(club, q, results)
         return jsonify({"results": results[:20]})
 
+async def _discover_autocomplete_url(client, club: str, date: str) -> str | None:
+    ymd = (date or "2025/09/05").replace("/","")
+    for hhmm in ("0700","0730","0800","0900","0000"):
+        url = f"/{club}/bookings/store/1/{ymd}/{hhmm}"
+        r3 = await client.get(url, headers={"User-Agent": UA, "Referer": url})
+        if r3.status_code != 200:
+            continue
+        autouri = await parse(find_autocomplete_url, r3.text)
+        if autouri:
+            return autouri if autouri.startswith("/") else "/" + autouri
+    return None
+
 # === Optional tiny placeholders for links in auth.html ===
 @app.get("/forgot")
 def forgot_password():
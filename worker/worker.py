@@ -1,16 +1,54 @@
 # worker/worker.py
-import sys, os, asyncio, traceback
-from datetime import datetime
+import sys, os, json, time, asyncio, traceback
+from types import MappingProxyType
+from sqlalchemy import select
 
 # ensure we can import the repo root (so "brs" is visible when run from /worker)
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from brs.models import SessionLocal, Job
+from brs.models import init_db, SessionLocal, Job
 from brs.security import decrypt
 from brs.engine import run_swapper_job
-from brs.config import POLL_SECONDS
+from brs.sheets import SheetHub
+from brs.sessions import SessionPool
+from brs.ratelimit import ClubLimiter, ClubHealth
+from brs.leases import CLAIMABLE_STATUSES, claim_jobs, renew_leases, release_all
+from brs.notify import JobChangeFeed
+from brs.utils import LoopLagMonitor
+from brs.events import EventWriter, compact
+from brs.status import StatusWriter
+from brs import metrics
+from brs import parsing
+from brs.config import (
+    VERBOSE, LIMIT_DEBUG_ROWS, WORKER_ID, LEASE_SECONDS, HEARTBEAT_SECONDS,
+    WORKER_MAX_JOBS, CLAIM_BATCH, RESCAN_SECONDS, CHANGE_POLL_SECONDS,
+    PARSE_WORKERS, LOOP_LAG_REPORT_SECONDS, EVENT_COMPACT_SECONDS, WORKER_METRICS_PORT, TRACES_PER_JOB,
+)
 
 RUNNING: dict[int, asyncio.Task] = {}  # job_id -> task
+LIMITER = ClubLimiter()  # per-club request budget shared by every poller
+HEALTH = ClubHealth()  # per-club backoff / circuit breaker
+SHEETS = SheetHub(limiter=LIMITER, health=HEALTH)  # shared tee-sheet pollers, one per club/course/date
+LAG = LoopLagMonitor()
+SESSIONS = SessionPool()  # logged-in BRS sessions, one per club/member
+EVENTS = EventWriter()  # batched per-job event log
+STATUS = StatusWriter(WORKER_ID)  # batched job status transitions
+
+JOB_OUTCOMES = metrics.counter("brs_job_outcomes_total", "Finished jobs by final status", ("status",))
+metrics.gauge("brs_worker_jobs", "Jobs running in this worker", fn=lambda: sum(1 for t in RUNNING.values() if not t.done()))
+metrics.gauge("brs_sheet_feeds", "Shared tee-sheet pollers", fn=lambda: SHEETS.stats()["feeds"])
+metrics.gauge("brs_loop_lag_ms", "Event-loop lag over the recent window", ("q",),
+              fn=lambda: {(q,): LAG.snapshot()[f"{q}_ms"] for q in ("p50", "p99", "max")})
+metrics.gauge("brs_events_dropped", "Job events dropped because the writer fell behind", fn=lambda: EVENTS.dropped)
+metrics.gauge("brs_status_pending", "Job status transitions not yet written", fn=lambda: len(STATUS.pending()))
+
+
+def log_sheet_changes(key: tuple, changes):
+    print(f"[sheet {'/'.join(key)}] " + "; ".join(str(c) for c in changes[:LIMIT_DEBUG_ROWS]))
+
+
+if VERBOSE:
+    SHEETS.on_changes(log_sheet_changes)
 
 
 def job_to_cfg(j: Job) -> dict:
@@ -20,79 +58,191 @@ def job_to_cfg(j: Job) -> dict:
         "username": decrypt(j.member_username_enc),
         "password": decrypt(j.member_password_enc),
         "target_date": j.target_date,
+        "targets": tuple(j.target_list()),
         "earliest": j.earliest,
         "latest": j.latest,
         "current_time": j.current_time,
         "player_ids": j.player_ids(),
         "required_seats": j.required_seats,
         "accept_at_least": j.accept_at_least,
+        "prefer": j.prefer,
+        "prefer_time": j.prefer_time,
         "poll_seconds": j.poll_seconds,
         "max_minutes": j.max_minutes,
     }
 
 
-async def run_one(job_id: int):
+def load_cfg(job_id: int) -> MappingProxyType | None:
+    # read-only snapshot of the job; the DB session is closed before the job runs
     db = SessionLocal()
     try:
         j = db.get(Job, job_id)
-        if not j:
-            return
-        cfg = job_to_cfg(j)
+        return MappingProxyType(job_to_cfg(j)) if j else None
+    finally:
+        db.close()
 
-        def log(msg: str):
-            print(f"[job {job_id}] {msg}")
 
-        log("starting")
-        j.status = "running"
-        db.commit()
+async def run_one(job_id: int):
+    try:
+        cfg = load_cfg(job_id)
+        if cfg is None:
+            return
 
-        result = await run_swapper_job(cfg, log=log)
-        log(f"finished: {result}")
-        j.status = result.get("status", "failed")
-        j.finished_at = datetime.utcnow()
-        j.last_log = str(result)
-        db.commit()
+        def log(msg: str, phase="info", slot=None, latency_ms=None):
+            print(f"[job {job_id}] {msg}")
+            EVENTS.emit(job_id, phase, msg, slot=slot, latency_ms=latency_ms)
+
+        traces = []
+
+        def keep_trace(tr):
+            traces.append(tr.to_dict())
+            del traces[:-TRACES_PER_JOB]
+            STATUS.traces(job_id, json.dumps(traces))
+
+        log("starting", phase="start")
+        STATUS.running(job_id)
+
+        result = await run_swapper_job(cfg, log=log, sheets=SHEETS, sessions=SESSIONS, trace_sink=keep_trace)
+        log(f"finished: {result}", phase="result", slot=result.get("time"), latency_ms=result.get("gap_ms"))
+        STATUS.finish(job_id, result.get("status", "failed"), str(result))
+        JOB_OUTCOMES.inc(status=result.get("status", "failed"))
+    except asyncio.CancelledError:
+        # stopped/deleted from the web app, or lease lost: leave the status alone
+        print(f"[job {job_id}] cancelled")
+        EVENTS.emit(job_id, "cancelled", "stopped, deleted or lease lost")
+        STATUS.release(job_id)
+        raise
     except Exception as e:
         print(f"[job {job_id}] crashed: {e}\n{traceback.format_exc()}")
-        try:
-            j = db.get(Job, job_id)
-            if j:
-                j.status = "failed"
-                j.finished_at = datetime.utcnow()
-                j.last_log = f"crash: {e}"
-                db.commit()
-        except:
-            pass
+        EVENTS.emit(job_id, "crash", f"{type(e).__name__}: {e}")
+        STATUS.finish(job_id, "failed", f"crash: {e}")
+        JOB_OUTCOMES.inc(status="crash")
     finally:
-        db.close()
+        EVENTS.forget(job_id)
         RUNNING.pop(job_id, None)
 
 
-async def scheduler_loop():
+async def heartbeat_loop():
     while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        ids = [jid for jid, t in RUNNING.items() if not t.done()]
         db = SessionLocal()
         try:
-            # pick jobs that are active or already running (in case of restarts)
-            jobs = db.query(Job).filter(Job.status.in_(("active", "running"))).all()
+            # finished jobs whose final status is still unwritten keep their lease too,
+            # or another worker could claim one that the DB still shows as running
+            owned = renew_leases(db, WORKER_ID, set(ids) | STATUS.pending(), LEASE_SECONDS)
+        except Exception as e:
+            print(f"[worker] heartbeat failed: {e}")
+            continue
         finally:
             db.close()
+        # another worker took these over after our lease lapsed; let it have them
+        for jid in set(ids) - owned:
+            print(f"[job {jid}] lease lost; stopping")
+            RUNNING[jid].cancel()
 
-        # start any not already running
-        for j in jobs:
-            if j.id not in RUNNING:
-                RUNNING[j.id] = asyncio.create_task(run_one(j.id))
 
-        # remove finished tasks
-        done = [jid for jid, t in RUNNING.items() if t.done()]
-        for jid in done:
-            RUNNING.pop(jid, None)
+def start_claimed(only=None) -> bool:
+    # True when the claim filled its batch: there are likely more jobs waiting
+    db = SessionLocal()
+    try:
+        room = min(WORKER_MAX_JOBS - len(RUNNING), CLAIM_BATCH)
+        ids = claim_jobs(db, WORKER_ID, room, LEASE_SECONDS, exclude=set(RUNNING) | STATUS.pending(), only=only)
+    finally:
+        db.close()
+    for jid in ids:
+        if jid not in RUNNING:
+            RUNNING[jid] = asyncio.create_task(run_one(jid))
+    return bool(ids) and len(ids) >= room
 
-        await asyncio.sleep(POLL_SECONDS)
+
+def apply_changes(ids: set[int]):
+    db = SessionLocal()
+    try:
+        status = dict(db.execute(select(Job.id, Job.status).where(Job.id.in_(ids))).all())
+    finally:
+        db.close()
+    for jid in ids:
+        t = RUNNING.get(jid)
+        if t and not t.done() and status.get(jid) not in CLAIMABLE_STATUSES:
+            print(f"[job {jid}] {status.get(jid) or 'deleted'}; cancelling")
+            t.cancel()
+    start_claimed(only=[jid for jid in ids if status.get(jid) == "active" and jid not in RUNNING])
+
+
+async def lag_report_loop():
+    while True:
+        await asyncio.sleep(LOOP_LAG_REPORT_SECONDS)
+        print(f"[worker] loop lag {LAG.snapshot()} jobs={len(RUNNING)} sheets={SHEETS.stats()}")
+
+
+async def compact_loop():
+    while True:
+        db = SessionLocal()
+        try:
+            n = compact(db)
+            if n: print(f"[events] compacted {n} old events")
+        except Exception as e:
+            print(f"[events] compaction failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(EVENT_COMPACT_SECONDS)
+
+
+async def scheduler_loop():
+    hb = asyncio.create_task(heartbeat_loop())
+    EVENTS.start()
+    STATUS.start()
+    compactor = asyncio.create_task(compact_loop())
+    LAG.start()
+    report = asyncio.create_task(lag_report_loop()) if LOOP_LAG_REPORT_SECONDS > 0 else None
+    changes = JobChangeFeed(CHANGE_POLL_SECONDS, watched=lambda: list(RUNNING.keys()))
+    await changes.start()
+    print(f"[worker] job changes via {changes.mode}")
+    exporter = await metrics.serve(WORKER_METRICS_PORT) if WORKER_METRICS_PORT else None
+    if exporter: print(f"[worker] metrics on :{WORKER_METRICS_PORT}")
+    next_scan = 0.0
+    try:
+        while True:
+            # remove finished tasks
+            done = [jid for jid, t in RUNNING.items() if t.done()]
+            for jid in done:
+                RUNNING.pop(jid, None)
+
+            # periodic claim scan picks up orphaned leases and anything we missed
+            # a full batch means more are waiting (e.g. after a restart): scan again straight away
+            if time.monotonic() >= next_scan:
+                full = start_claimed()
+                next_scan = time.monotonic() + (0 if full else RESCAN_SECONDS)
+
+            ids = await changes.wait(timeout=max(0.0, next_scan - time.monotonic()))
+            if ids:
+                apply_changes(ids)
+    finally:
+        changes.close()
+        hb.cancel()
+        compactor.cancel()
+        if exporter: exporter.close()
+        await EVENTS.close()
+        await STATUS.close()
+        LAG.stop()
+        if report: report.cancel()
 
 
 def main():
-    print("[worker] booting…")
-    asyncio.run(scheduler_loop())
+    print(f"[worker] booting… id={WORKER_ID}")
+    init_db()
+    parsing.configure(PARSE_WORKERS)
+    try:
+        asyncio.run(scheduler_loop())
+    finally:
+        parsing.shutdown()
+        # hand our jobs straight back instead of waiting for the leases to lapse
+        db = SessionLocal()
+        try:
+            release_all(db, WORKER_ID)
+        finally:
+            db.close()
 
 
 if __name__ == "__main__":